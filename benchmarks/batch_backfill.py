@@ -0,0 +1,120 @@
+"""
+run_batch_backfill (--batch): submit, poll, merge and idempotent re-merge
+against the local stand-ins, in a scratch workspace.
+
+  1. The first run downloads and extracts the pending decrees, submits one
+     batch and times out while it is still in progress; the batch is kept
+     in batch_state.json and nothing is summarized yet.
+  2. The second run picks the same batch up (no new submission), polls it
+     to completion and merges every analysis.
+  3. Merging the same batch again (batch_state.json restored) changes
+     nothing: existing summaries are never overwritten.
+
+No chat completion may be sent outside the batch.
+
+    python benchmarks/batch_backfill.py [--decrees N] [--verbose]
+
+Exits with status 1 if any check fails.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from fixtures import decree_pdf, index_page_html  # noqa: E402
+from stand_ins import FakeOpenAIServer, MincitServer  # noqa: E402
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Silences watcher's prints, including those of its worker processes."""
+    if not enabled:
+        yield
+        return
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--decrees", type=int, default=4)
+    parser.add_argument("--verbose", action="store_true", help="show watcher's output")
+    args = parser.parse_args()
+
+    attachments = {
+        f"/getattachment/batch-{n}/Decreto-{n + 1:04d}.aspx": decree_pdf(("small", "medium")[n % 2], seed=200 + n)
+        for n in range(args.decrees)
+    }
+    workspace = Path(tempfile.mkdtemp(prefix="watcher-batch-"))
+    failures = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{f' ({detail})' if detail else ''}")
+        if not ok:
+            failures.append(name)
+
+    with MincitServer(attachments=attachments) as mincit, FakeOpenAIServer(batch_polls=2) as openai:
+        mincit.index_pages[2025] = index_page_html(2025, list(attachments), host=mincit.url)
+        os.environ["OPENAI_API_KEY"] = "benchmark"
+        os.environ["OPENAI_BASE_URL"] = openai.base_url()
+        os.chdir(workspace)
+        try:
+            import watcher
+
+            watcher.BASE_URL = mincit.index_url()
+            watcher.YEARS = [2025]
+            watcher._http_client = watcher.HttpClient(min_interval_per_host=0.0)
+            state_file = Path(watcher.BATCH_STATE_FILE)
+
+            with quiet(not args.verbose):
+                watcher.run_batch_backfill(poll_interval=0, timeout=0)
+            pending = state_file.read_text(encoding="utf-8") if state_file.exists() else None
+            submitted = len(json.loads(pending)["items"]) if pending else 0
+            check("submit: batch left pending", pending is not None and len(openai.batches) == 1,
+                  f"{len(openai.batches)} batch(es), {submitted} request(s)")
+            check("submit: nothing merged yet", not watcher.load_summaries())
+
+            with quiet(not args.verbose):
+                watcher.run_batch_backfill(poll_interval=0.01, timeout=10)
+            summaries = watcher.load_summaries()
+            check("poll + merge: every submitted decree summarized", submitted and len(summaries) == submitted,
+                  f"{len(summaries)}/{submitted}")
+            check("poll + merge: same batch collected", len(openai.batches) == 1 and not state_file.exists())
+            check("poll + merge: summaries from the batch",
+                  all(s["summary"] == FakeOpenAIServer.SUMMARY.strip() for s in summaries.values()))
+
+            exported = Path("summaries.json").read_bytes()
+            state_file.write_text(pending, encoding="utf-8")
+            with quiet(not args.verbose):
+                watcher.run_batch_backfill(poll_interval=0.01, timeout=10)
+            check("re-merge: summaries unchanged",
+                  watcher.load_summaries() == summaries and Path("summaries.json").read_bytes() == exported)
+            check("re-merge: no new batch", len(openai.batches) == 1 and not state_file.exists())
+            check("no chat completions outside the batch", openai.completions == 0, f"{openai.completions}")
+        finally:
+            os.chdir(REPO_DIR)
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
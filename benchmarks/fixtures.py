@@ -0,0 +1,213 @@
+"""
+Fixture corpus for the benchmarks: MINCIT-like decree index pages and
+synthetic decree PDFs.
+
+The pages mimic the layout of www.mincit.gov.co/normatividad/decretos/{year}
+(Kentico site: long navigation menus, inline scripts, comments, footer) with
+the decree list in the middle, plus the odd markup a real page carries:
+duplicate links, relative and absolute URLs, entities in attributes,
+single-quoted / unquoted / upper-case attributes, /getattachment/ links
+that are not decrees, and attachment URLs inside scripts and comments
+(which must not be picked up).
+
+The PDFs (decree_pdf) are generated in memory: text-only pages of Spanish
+decree-like prose with ARTÍCULO headings, in PDF_SIZES variants.
+
+    python benchmarks/fixtures.py   # (re)writes benchmarks/fixtures/pages/*.html
+"""
+
+import json
+import random
+import uuid
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+PAGES_DIR = FIXTURES_DIR / "pages"
+REPO_DIR = FIXTURES_DIR.parent.parent
+
+MONTHS = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+]
+
+MENU_SECTIONS = [
+    "Ministerio", "Normatividad", "Prensa", "Servicios", "Transparencia",
+    "Participa", "Atención al ciudadano", "Comercio", "Industria", "Turismo",
+]
+
+
+def synthetic_decree_urls(year: int, count: int, seed: int = 0) -> list:
+    """Deterministic /getattachment/<guid>/Decreto-NNNN-del-D-de-MES-de-YYYY.aspx paths."""
+    rng = random.Random(f"{year}-{seed}")
+    paths = []
+    for n in range(count):
+        guid = uuid.UUID(int=rng.getrandbits(128), version=4)
+        month = MONTHS[n * 12 // max(count, 1)]
+        day = rng.randint(1, 28)
+        paths.append(f"/getattachment/{guid}/Decreto-{n + 1:04d}-del-{day}-de-{month}-de-{year}.aspx")
+    return paths
+
+
+# name -> number of pages of the synthetic decree PDFs
+PDF_SIZES = {"small": 2, "medium": 15, "large": 80}
+
+DECREE_SENTENCES = [
+    "Que el Gobierno nacional, en ejercicio de sus facultades constitucionales y legales, considera necesario",
+    "modificar parcialmente el Arancel de Aduanas para las subpartidas señaladas en el presente decreto,",
+    "con el fin de promover la competitividad de la industria nacional y la seguridad alimentaria del país.",
+    "El Ministerio de Comercio, Industria y Turismo publicó el proyecto para comentarios de la ciudadanía.",
+    "Las importaciones de bienes clasificados en las subpartidas arancelarias tendrán un gravamen del cero",
+    "por ciento (0%), durante el término de vigencia previsto, siempre que cumplan los requisitos aquí fijados.",
+    "El Comité de Asuntos Aduaneros, Arancelarios y de Comercio Exterior recomendó la adopción de la medida.",
+    "La Dirección de Impuestos y Aduanas Nacionales (DIAN) ejercerá el control sobre el cumplimiento del decreto.",
+]
+
+
+def decree_pages(num_pages: int, seed: int = 0, lines_per_page: int = 55) -> list:
+    """Text of each page of a synthetic decree."""
+    rng = random.Random(f"pdf-{num_pages}-{seed}")
+    pages = []
+    article = 1
+    for page in range(num_pages):
+        lines = []
+        if page == 0:
+            lines += ["REPÚBLICA DE COLOMBIA", f"DECRETO NÚMERO {seed + 1000} DE 2025", ""]
+        while len(lines) < lines_per_page:
+            if rng.random() < 0.12:
+                lines += ["", f"ARTÍCULO {article}. Objeto y ámbito de aplicación."]
+                article += 1
+            lines.append(rng.choice(DECREE_SENTENCES))
+        pages.append("\n".join(lines[:lines_per_page]))
+    return pages
+
+
+def make_pdf(pages_text: list) -> bytes:
+    """A minimal valid PDF with one Helvetica text page per entry (no dependencies)."""
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for text in pages_text:
+        escaped = [
+            line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            for line in text.split("\n")
+        ]
+        stream = ("BT /F1 9 Tf 40 800 Td 13 TL " + " ".join(f"({line}) '" for line in escaped) + " ET")
+        stream = stream.encode("cp1252", errors="replace")
+        kids.append(len(objs) + 1)
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objs) + 2} 0 R >>".encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objs[1] = (
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids), len(kids))
+    ).encode()
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % (i + 1) + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return out
+
+
+def decree_pdf(size: str, seed: int = 0) -> bytes:
+    return make_pdf(decree_pages(PDF_SIZES[size], seed))
+
+
+def _menu(rng: random.Random) -> str:
+    parts = ['<nav class="main-menu"><ul>']
+    for section in MENU_SECTIONS:
+        slug = section.lower().replace(" ", "-")
+        parts.append(f'<li class="dropdown"><a href="/{slug}" class="dropdown-toggle">{section}</a><ul class="submenu">')
+        for i in range(rng.randint(8, 20)):
+            parts.append(f'<li><a href="/{slug}/item-{i}" title="{section} {i}">{section} – opción {i}</a></li>')
+        parts.append("</ul></li>")
+    parts.append("</ul></nav>")
+    return "\n".join(parts)
+
+
+def _decree_row(path: str, style: int, host: str) -> str:
+    name = path.rsplit("/", 1)[-1].replace(".aspx", "").replace("-", " ")
+    if style == 0:
+        link = f'<a href="{path}" target="_blank">{name}</a>'
+    elif style == 1:
+        link = f"<a class='doc-link' href='{host}{path}'>{name}</a>"
+    elif style == 2:
+        link = f"<A HREF={path} TARGET=_blank>{name}</A>"
+    else:
+        link = f'<a\n   title="Descargar {name}"\n   href="{path}?lang=es-CO&amp;ext=.aspx">{name}</a>'
+    return (
+        '<div class="item-normatividad"><div class="fecha">'
+        f"<span>{name.split(' del ')[-1] if ' del ' in name else ''}</span></div>"
+        f'<div class="titulo">{link}</div>'
+        f'<div class="descargar"><a href="{path}" class="btn btn-descarga"><i class="icon-pdf"></i> Descargar</a></div>'
+        "</div>"
+    )
+
+
+def index_page_html(year: int, decree_paths: list, seed: int = 0, host: str = "https://www.mincit.gov.co") -> str:
+    """
+    A MINCIT-like index page listing decree_paths in assorted link styles,
+    some of them absolute URLs on `host` (pass a MincitServer's url to keep
+    every link on the stand-in).
+    """
+    rng = random.Random(f"page-{year}-{seed}")
+    rows = []
+    for n, path in enumerate(decree_paths):
+        rows.append(_decree_row(path, n % 4, host))
+        if n % 25 == 7:
+            # Not decrees: other attachments and a commented-out link
+            rows.append(f'<a href="/getattachment/{uuid.UUID(int=rng.getrandbits(128))}/Anexo-{n}.pdf">Anexo</a>')
+            rows.append(f'<!-- <a href="/getattachment/retirado-{n}/Decreto-retirado.aspx">retirado</a> -->')
+
+    script_data = json.dumps({"destacados": decree_paths[:5], "buscador": "/normatividad/buscar"})
+    return "\n".join([
+        "<!DOCTYPE html>",
+        '<html lang="es"><head><meta charset="utf-8">',
+        f"<title>Decretos {year} - Ministerio de Comercio, Industria y Turismo</title>",
+        '<link rel="stylesheet" href="/CMSPages/GetResource.ashx?stylesheetname=MinCIT">',
+        "<style>.item-normatividad a[href*='/getattachment/']{font-weight:bold}</style>",
+        f"<script>var pageData = {script_data};\n"
+        "document.write('<a href=\"/getattachment/x/Decreto-script.aspx\">x</a>');</script>",
+        "</head><body>",
+        '<header><a href="/" class="logo"><img src="/getmedia/logo.png" alt="MinCIT"></a></header>',
+        _menu(rng),
+        f'<main><h1>Decretos {year}</h1><div class="listado-normatividad">',
+        *rows,
+        "</div></main>",
+        '<footer><a href="/getattachment/politica/Politica-de-privacidad.pdf">Política de privacidad</a>',
+        _menu(rng),
+        "</footer>",
+        '<script src="/CMSScripts/jquery.js"></script>',
+        "</body></html>",
+    ])
+
+
+def index_pages() -> dict:
+    """{file name: html} of the saved index pages used by the benchmarks."""
+    known = json.loads((REPO_DIR / "known_files.json").read_text(encoding="utf-8"))
+    current = [url.split("mincit.gov.co", 1)[-1] for url in known]
+    return {
+        "decretos-2025.html": index_page_html(2025, current),
+        "decretos-2024.html": index_page_html(2024, synthetic_decree_urls(2024, 150)),
+        "decretos-2019.html": index_page_html(2019, synthetic_decree_urls(2019, 600)),
+    }
+
+
+def write_index_pages():
+    PAGES_DIR.mkdir(parents=True, exist_ok=True)
+    for name, html in index_pages().items():
+        (PAGES_DIR / name).write_text(html, encoding="utf-8")
+        print(f"wrote {PAGES_DIR / name} ({len(html) // 1024} KiB)")
+
+
+if __name__ == "__main__":
+    write_index_pages()
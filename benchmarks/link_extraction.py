@@ -0,0 +1,113 @@
+"""
+extract_decree_files: equivalence with the previous BeautifulSoup
+implementation, and speedup.
+
+For every saved index page in benchmarks/fixtures/pages/ (see fixtures.py)
+and a set of tricky markup snippets, the link-only scanner in watcher.py
+must return exactly what the BeautifulSoup(html.parser) version returned.
+Timings are medians over --runs repetitions per page.
+
+    python benchmarks/link_extraction.py [--runs N]
+
+Exits with status 1 if any output differs. Needs beautifulsoup4
+(pip install -r benchmarks/requirements.txt).
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import watcher  # noqa: E402
+from fixtures import PAGES_DIR, write_index_pages  # noqa: E402
+
+BASE_URL = "https://www.mincit.gov.co/normatividad/decretos/2025"
+
+EDGE_CASES = {
+    "duplicate-href": '<a href="/x/getattachment/1/A.aspx" href="/getattachment/2/B.aspx">x</a>',
+    "entities": '<a href="/getattachment/3/C&#46;aspx">c</a><a href="/getattachment/4/D.aspx?a=1&amp;b=.aspx">d</a>',
+    "unquoted-uppercase": "<A HREF=/getattachment/5/E.ASPX>e</A><a href = '/getattachment/6/F.aspx'>f</a>",
+    "whitespace": '<a href=" /getattachment/7/G.aspx \n">g</a><a\n\thref="/getattachment/8/H.aspx"\n>h</a>',
+    "no-href": '<a name="top">t</a><a href>e</a><a data-href="/getattachment/9/I.aspx">i</a>',
+    "comments-scripts": (
+        '<!-- <a href="/getattachment/10/J.aspx"> -->'
+        "<script>var s = '<a href=\"/getattachment/11/K.aspx\">';</script>"
+        '<STYLE>a[href="/getattachment/12/L.aspx"]{}</STYLE>'
+        '<a href="/getattachment/13/M.aspx">m</a>'
+    ),
+    "quoted-gt": '<a title="a > b" href="/getattachment/14/N.aspx">n</a>',
+    "not-anchors": '<abbr href="/getattachment/15/O.aspx">o</abbr><link href="/getattachment/16/P.aspx">',
+    "absolute-and-relative": (
+        '<a href="https://www.mincit.gov.co/getattachment/17/Q.aspx">q</a>'
+        '<a href="../getattachment/17/Q.aspx">q</a><a href="getattachment/18/R.aspx">r</a>'
+    ),
+}
+
+
+def bs4_extract_decree_files(html: str, base_url: str):
+    """The BeautifulSoup implementation extract_decree_files replaced."""
+    soup = BeautifulSoup(html, "html.parser")
+    files = []
+    for a in soup.find_all("a", href=True):
+        href = str(a["href"]).strip()
+        if "/getattachment/" in href and href.lower().endswith(".aspx"):
+            full_url = urljoin(base_url, href)
+            files.append({"url": full_url, "name": full_url.split("/")[-1]})
+    return list({f["url"]: f for f in files}.values())
+
+
+def median_ms(fn, html: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn(html, BASE_URL)
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="extract_decree_files equivalence + benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    if not PAGES_DIR.exists():
+        write_index_pages()
+
+    mismatches = []
+    for name, html in EDGE_CASES.items():
+        if watcher.extract_decree_files(html, BASE_URL) != bs4_extract_decree_files(html, BASE_URL):
+            mismatches.append(name)
+
+    pages = []
+    for path in sorted(PAGES_DIR.glob("*.html")):
+        html = path.read_text(encoding="utf-8")
+        expected = bs4_extract_decree_files(html, BASE_URL)
+        if watcher.extract_decree_files(html, BASE_URL) != expected:
+            mismatches.append(path.name)
+        bs4_ms = median_ms(bs4_extract_decree_files, html, args.runs)
+        scan_ms = median_ms(watcher.extract_decree_files, html, args.runs)
+        pages.append({
+            "page": path.name,
+            "bytes": len(html.encode("utf-8")),
+            "links": len(expected),
+            "bs4_ms": round(bs4_ms, 3),
+            "scan_ms": round(scan_ms, 3),
+            "speedup": round(bs4_ms / scan_ms, 1) if scan_ms else None,
+        })
+
+    print(json.dumps({"pages": pages, "edge_cases": len(EDGE_CASES), "mismatches": mismatches}, indent=2))
+    if mismatches:
+        print(f"FAIL: output differs from BeautifulSoup for {', '.join(mismatches)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
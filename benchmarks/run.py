@@ -0,0 +1,348 @@
+"""
+Offline benchmark suite for watcher.py.
+
+Everything runs locally: index pages and PDFs come from the fixture corpus
+(fixtures.py) through a MincitServer, and ChatGPT is a FakeOpenAIServer
+(stand_ins.py), each with configurable latency. Every benchmark runs in a
+scratch workspace (state database, caches, downloads and reports are
+created there), so the repository's own files are never touched.
+
+Benchmarks:
+  extract_decree_files   per saved index page
+  download_file          per PDF size, fresh download each run
+  extract_text_from_pdf  per PDF size, cold (empty text cache) and warm
+  analyze_file           per PDF size, text cached, LLM cache bypassed
+  markdown_report        generate_markdown_report, cold and warm
+  html_report            generate_html_report, cold and warm
+  main                   end-to-end run on a fresh workspace, then an
+                         unchanged re-run
+
+Results are printed (or written with --output) as JSON: for each case the
+p50/p95/mean latency in milliseconds and its throughput, for regression
+tracking.
+
+    python benchmarks/run.py [--runs N] [--only NAME ...] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from fixtures import PAGES_DIR, PDF_SIZES, decree_pdf, index_page_html, synthetic_decree_urls, write_index_pages  # noqa: E402
+from stand_ins import FakeOpenAIServer, MincitServer  # noqa: E402
+
+BENCHMARKS = [
+    "extract_decree_files", "download_file", "extract_text_from_pdf",
+    "analyze_file", "markdown_report", "html_report", "main",
+]
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(name: str, case: str, samples_ms: list, units: float = 1, unit: str = "ops") -> dict:
+    """units = work per run (e.g. bytes, decrees) for the throughput figure."""
+    total_s = sum(samples_ms) / 1000
+    return {
+        "benchmark": name,
+        "case": case,
+        "runs": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 0.50), 3),
+        "p95_ms": round(percentile(samples_ms, 0.95), 3),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "throughput": round(units * len(samples_ms) / total_s, 3) if total_s else None,
+        "throughput_unit": f"{unit}/s",
+    }
+
+
+class Suite:
+    def __init__(self, args):
+        self.args = args
+        self.root = Path(tempfile.mkdtemp(prefix="watcher-bench-"))
+        self.results = []
+        self.pdfs = {size: decree_pdf(size, seed=n) for n, size in enumerate(PDF_SIZES)}
+        self.attachments = {
+            f"/getattachment/bench-{size}/Decreto-{size}.aspx": data for size, data in self.pdfs.items()
+        }
+        self.mincit = MincitServer(attachments=self.attachments, latency=args.latency).start()
+        self.openai = FakeOpenAIServer(latency=args.openai_latency).start()
+
+        os.environ["OPENAI_API_KEY"] = "benchmark"
+        os.environ["OPENAI_BASE_URL"] = self.openai.base_url()
+        self.workspace("import")
+        with self.quiet():
+            import watcher
+        self.watcher = watcher
+        watcher.BASE_URL = self.mincit.index_url()
+        # Measure watcher.py, not the politeness delays and API quotas
+        # configured for the real services
+        watcher._http_client = watcher.HttpClient(min_interval_per_host=0.0)
+        watcher._openai_limiter = watcher.TokenBucketLimiter(10**6, 10**9)
+        # Load the lazily imported dependencies before anything is timed
+        with self.quiet():
+            watcher.get_openai_client()
+            import pypdf  # noqa: F401
+            import requests  # noqa: F401
+
+    def close(self):
+        self.mincit.stop()
+        self.openai.stop()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    @contextlib.contextmanager
+    def quiet(self):
+        """Silences watcher's prints, including those of its worker processes."""
+        if self.args.verbose:
+            yield
+            return
+        sys.stdout.flush()
+        saved = os.dup(1)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+            os.close(devnull)
+
+    def workspace(self, name: str) -> Path:
+        """chdir into a fresh directory and drop watcher's per-directory singletons."""
+        path = Path(tempfile.mkdtemp(prefix=f"{name}-", dir=self.root))
+        os.chdir(path)
+        w = sys.modules.get("watcher")
+        if w is not None:
+            if w._state_store is not None:
+                w._state_store.conn.close()
+            w._state_store = None
+            w._text_cache = None
+            w._llm_cache = None
+            w._fragment_cache = None
+        return path
+
+    def timed(self, fn, runs: int, setup=None) -> list:
+        samples = []
+        for _ in range(runs):
+            if setup is not None:
+                setup()
+            with self.quiet():
+                start = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    def record(self, *args, **kwargs):
+        result = summarize(*args, **kwargs)
+        self.results.append(result)
+        print(f"{result['benchmark']:<22} {result['case']:<20} p50 {result['p50_ms']:>9.2f} ms  "
+              f"p95 {result['p95_ms']:>9.2f} ms  {result['throughput']} {result['throughput_unit']}",
+              file=sys.stderr)
+
+    # --- benchmarks ---
+
+    def bench_extract_decree_files(self):
+        if not PAGES_DIR.exists():
+            write_index_pages()
+        for path in sorted(PAGES_DIR.glob("*.html")):
+            html = path.read_text(encoding="utf-8")
+            samples = self.timed(lambda: self.watcher.extract_decree_files(html, self.watcher.BASE_URL),
+                                 self.args.runs * 4)
+            self.record("extract_decree_files", path.stem, samples, len(html.encode("utf-8")) / 1e6, "MB")
+
+    def bench_download_file(self):
+        self.workspace("download")
+        for path, data in self.attachments.items():
+            info = {"url": self.mincit.url + path, "name": path.rsplit("/", 1)[-1]}
+            dest = self.watcher.download_path(info)
+
+            def clean():
+                for p in (dest, dest.with_name(dest.name + ".sha256"), dest.with_name(dest.name + ".part")):
+                    p.unlink(missing_ok=True)
+
+            samples = self.timed(lambda: self.watcher.download_file(dict(info)), self.args.runs, clean)
+            self.record("download_file", path.rsplit("-", 1)[-1][:-5], samples, len(data) / 1e6, "MB")
+
+    def _pdf_files(self) -> dict:
+        files = {}
+        for size, data in self.pdfs.items():
+            path = Path(f"Decreto-{size}.pdf").resolve()
+            path.write_bytes(data)
+            files[size] = path
+        return files
+
+    def bench_extract_text_from_pdf(self):
+        self.workspace("extract")
+        for size, path in self._pdf_files().items():
+            pages = PDF_SIZES[size]
+
+            def cold_cache():
+                self.watcher.CACHE_DIR = Path(tempfile.mkdtemp(dir=self.root))
+                self.watcher._text_cache = None
+
+            samples = self.timed(lambda: self.watcher.extract_text_from_pdf(path), self.args.runs, cold_cache)
+            self.record("extract_text_from_pdf", f"{size}/cold", samples, pages, "pages")
+            samples = self.timed(lambda: self.watcher.extract_text_from_pdf(path), self.args.runs)
+            self.record("extract_text_from_pdf", f"{size}/warm", samples, pages, "pages")
+        self.watcher.CACHE_DIR = Path(".cache")
+
+    def bench_analyze_file(self):
+        self.workspace("analyze")
+        w = self.watcher
+        w.LLM_CACHE_REFRESH = True
+        try:
+            for size, path in self._pdf_files().items():
+                with self.quiet():
+                    w.extract_text_from_pdf(path, max_chars=w.MAX_DOCUMENT_CHARS)  # analysis only, text cached
+                before = self.openai.requests
+                samples = self.timed(lambda: w.analyze_file(path, path.name, 2025, w.DEFAULT_SOURCE), self.args.runs)
+                self.record("analyze_file", size, samples, 1, "decrees")
+                self.results[-1]["openai_requests_per_run"] = (self.openai.requests - before) / self.args.runs
+        finally:
+            w.LLM_CACHE_REFRESH = False
+
+    def _summaries(self, count: int) -> dict:
+        summaries = {}
+        for n, path in enumerate(synthetic_decree_urls(2024, count)):
+            url = "https://www.mincit.gov.co" + path
+            summaries[url] = {
+                "name": path.rsplit("/", 1)[-1],
+                "local_path": f"downloads/{n}.pdf",
+                "summary": FakeOpenAIServer.SUMMARY.strip() + f" ({n})",
+                "themes": ["Comercio exterior", "Aduanas", f"Tema {n % 17}"],
+                "source": "Ministerio de Comercio, Industria y Turismo",
+                "year": 2024 - n % 3,
+                "sha256": f"{n:064x}",
+            }
+        return summaries
+
+    def _bench_report(self, name: str, generate):
+        self.workspace(name)
+        summaries = self._summaries(self.args.report_decrees)
+        out = Path(f"report.{name}").resolve()
+
+        def cold():
+            out.unlink(missing_ok=True)
+            self.watcher.CACHE_DIR = Path(tempfile.mkdtemp(dir=self.root))
+            self.watcher._fragment_cache = None
+
+        samples = self.timed(lambda: generate(summaries, out), self.args.runs, cold)
+        self.record(name, "cold", samples, len(summaries), "decrees")
+        samples = self.timed(lambda: generate(summaries, out), self.args.runs)
+        self.record(name, "warm", samples, len(summaries), "decrees")
+        self.watcher.CACHE_DIR = Path(".cache")
+
+    def bench_markdown_report(self):
+        self._bench_report("markdown_report", self.watcher.generate_markdown_report)
+
+    def bench_html_report(self):
+        self._bench_report("html_report", self.watcher.generate_html_report)
+
+    def bench_main(self):
+        w = self.watcher
+        paths = []
+        sizes = list(self.pdfs)
+        for n in range(self.args.decrees):
+            size = sizes[n % len(sizes)]
+            path = f"/getattachment/e2e-{n}/Decreto-{n + 1:04d}-{size}.aspx"
+            self.mincit.attachments[path] = decree_pdf(size, seed=100 + n)
+            paths.append(path)
+        # Absolute links point at the stand-in too, so nothing leaves the machine
+        self.mincit.index_pages[2025] = index_page_html(2025, paths, host=self.mincit.url)
+        w.YEARS = [2025]
+
+        fresh, unchanged = [], []
+        for _ in range(self.args.runs):
+            self.workspace("main")
+            for samples in (fresh, unchanged):
+                requests_before = self.mincit.requests
+                with self.quiet():
+                    start = time.perf_counter()
+                    w.main()
+                    samples.append((time.perf_counter() - start) * 1000)
+                # A failed download or a retried decree would time something
+                # else than the path named by the case
+                failed = w.load_failed_files()
+                if failed:
+                    raise RuntimeError(f"main: {len(failed)} decree(s) failed: {', '.join(sorted(failed))}")
+                if samples is unchanged and self.mincit.requests - requests_before != 1:
+                    raise RuntimeError(
+                        f"main: the second run sent {self.mincit.requests - requests_before} request(s), "
+                        "expected only the index page's conditional GET"
+                    )
+        self.record("main", f"new/{self.args.decrees}", fresh, self.args.decrees, "decrees")
+        self.record("main", "unchanged", unchanged, 1, "runs")
+
+    def run(self, names: list):
+        for name in names:
+            getattr(self, f"bench_{name}")()
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for watcher.py")
+    parser.add_argument("--runs", type=int, default=5, help="runs per case (default 5)")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="benchmarks to run (default: all)")
+    parser.add_argument("--latency", type=float, default=0.0, help="MINCIT stand-in latency per request, seconds")
+    parser.add_argument("--openai-latency", type=float, default=0.05, help="fake OpenAI latency per request, seconds")
+    parser.add_argument("--decrees", type=int, default=12, help="new decrees in the end-to-end benchmark")
+    parser.add_argument("--report-decrees", type=int, default=500, help="decrees in the report benchmarks")
+    parser.add_argument("--output", type=Path, help="write the JSON results here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show watcher.py's own output")
+    args = parser.parse_args()
+
+    suite = Suite(args)
+    try:
+        suite.run(args.only or BENCHMARKS)
+    finally:
+        suite.close()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "latency_s": args.latency,
+            "openai_latency_s": args.openai_latency,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": suite.results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
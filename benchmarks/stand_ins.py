@@ -0,0 +1,318 @@
+"""
+Local stand-ins for the services watcher.py talks to, for offline benchmarks.
+
+- MincitServer: serves /normatividad/decretos/{year} index pages (with ETag
+  and 304 Not Modified) and /getattachment/... PDFs (with ETag, Range and
+  If-Range support).
+- FakeOpenAIServer: answers POST /v1/chat/completions with a valid
+  structured-output analysis, like the real API in json_schema mode, and
+  fakes the Files and Batches endpoints used by `watcher.py --batch`.
+
+Both run a ThreadingHTTPServer on 127.0.0.1 in a background thread, add a
+configurable per-request latency (seconds) and count the requests they
+served. Use them as context managers or call start()/stop().
+"""
+
+import hashlib
+import json
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StandInServer:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes: without this, Nagle's
+            # algorithm delays every keep-alive response by ~40 ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stand_in._count()
+                stand_in.handle_get(self)
+
+            def do_HEAD(self):
+                stand_in._count()
+                stand_in.handle_get(self, head=True)
+
+            def do_POST(self):
+                stand_in._count()
+                length = int(self.headers.get("Content-Length") or 0)
+                stand_in.handle_post(self, self.rfile.read(length))
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def send(handler, status: int, body: bytes = b"", content_type: str = "text/plain",
+             headers: dict | None = None, head: bool = False):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        if body and not head:
+            handler.wfile.write(body)
+
+    def handle_get(self, handler, head: bool = False):
+        self.send(handler, 405, head=head)
+
+    def handle_post(self, handler, body: bytes):
+        self.send(handler, 405)
+
+
+class MincitServer(_StandInServer):
+    """
+    Index pages keyed by year and PDFs keyed by path
+    (e.g. "/getattachment/<guid>/Decreto-1.aspx"). Both dicts can be changed
+    while the server runs.
+    """
+
+    def __init__(self, index_pages: dict | None = None, attachments: dict | None = None, latency: float = 0.0):
+        super().__init__(latency)
+        self.index_pages = dict(index_pages or {})
+        self.attachments = dict(attachments or {})
+
+    def index_url(self) -> str:
+        """BASE_URL pointing at this server."""
+        return self.url + "/normatividad/decretos/{year}"
+
+    def handle_get(self, handler, head: bool = False):
+        path = handler.path.split("?", 1)[0]
+        prefix = "/normatividad/decretos/"
+        if path.startswith(prefix) and path[len(prefix):].isdigit():
+            html = self.index_pages.get(int(path[len(prefix):]))
+            if html is None:
+                return self.send(handler, 404, head=head)
+            body = html.encode("utf-8")
+            etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+            if handler.headers.get("If-None-Match") == etag:
+                return self.send(handler, 304, headers={"ETag": etag}, head=True)
+            return self.send(handler, 200, body, "text/html; charset=utf-8", {"ETag": etag}, head)
+
+        data = self.attachments.get(path)
+        if data is None:
+            return self.send(handler, 404, head=head)
+        etag = '"%s"' % hashlib.sha256(data).hexdigest()[:16]
+        if handler.headers.get("If-None-Match") == etag:
+            return self.send(handler, 304, headers={"ETag": etag}, head=True)
+        range_header = handler.headers.get("Range")
+        if_range = handler.headers.get("If-Range")
+        if range_header and range_header.startswith("bytes=") and if_range in (None, etag):
+            start = int(range_header[len("bytes="):].split("-", 1)[0] or 0)
+            if start >= len(data):
+                return self.send(handler, 416, headers={"Content-Range": f"bytes */{len(data)}"}, head=head)
+            return self.send(
+                handler, 206, data[start:], "application/pdf",
+                {"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}", "Accept-Ranges": "bytes",
+                 "ETag": etag},
+                head,
+            )
+        return self.send(handler, 200, data, "application/pdf", {"Accept-Ranges": "bytes", "ETag": etag}, head)
+
+
+class FakeOpenAIServer(_StandInServer):
+    """
+    Chat completions: the reply is a JSON object with the fields the
+    request's json_schema requires (summary, themes, source), sized like a
+    real analysis; usage reports prompt tokens as characters / 4.
+
+    Files and Batches, as used by the Batch API (files.create,
+    batches.create, batches.retrieve, files.content): uploaded files are
+    kept in memory, and a batch reports "in_progress" for its first
+    `batch_polls` retrievals, then "completed" with an output file holding
+    one chat completion per input line. `completions` counts the chat
+    completions served directly (not through a batch).
+    """
+
+    SUMMARY = (
+        "El decreto modifica parcialmente el Arancel de Aduanas para un grupo de subpartidas, "
+        "con impacto en importadores y en las obligaciones de cumplimiento aduanero. "
+    ) * 3
+
+    def __init__(self, latency: float = 0.0, batch_polls: int = 1):
+        super().__init__(latency)
+        self.batch_polls = batch_polls
+        self.completions = 0
+        self.files = {}    # file id -> (file object, content)
+        self.batches = {}  # batch id -> batch object
+        self._polls = {}   # batch id -> retrievals so far
+
+    def base_url(self) -> str:
+        """OPENAI_BASE_URL pointing at this server."""
+        return self.url + "/v1"
+
+    def _next_id(self, prefix: str, items: dict) -> str:
+        with self._lock:
+            item_id = f"{prefix}-{len(items) + 1}"
+            items[item_id] = None
+        return item_id
+
+    def _send_json(self, handler, obj: dict, status: int = 200):
+        self.send(handler, status, json.dumps(obj).encode("utf-8"), "application/json")
+
+    def handle_post(self, handler, body: bytes):
+        path = handler.path.split("?", 1)[0]
+        if path.endswith("/chat/completions"):
+            with self._lock:
+                self.completions += 1
+            return self._send_json(handler, self.completion(json.loads(body)))
+        if path.endswith("/files"):
+            return self._send_json(handler, self.create_file(handler.headers["Content-Type"], body))
+        if path.endswith("/batches"):
+            request = json.loads(body)
+            if request.get("input_file_id") not in self.files:
+                return self._send_json(handler, {"error": {"message": "No such file"}}, 404)
+            return self._send_json(handler, self.create_batch(request))
+        self.send(handler, 404)
+
+    def handle_get(self, handler, head: bool = False):
+        parts = handler.path.split("?", 1)[0].strip("/").split("/")
+        if parts[-2:-1] == ["batches"] and parts[-1] in self.batches:
+            return self._send_json(handler, self.retrieve_batch(parts[-1]))
+        if parts[-3:-2] == ["files"] and parts[-1] == "content" and parts[-2] in self.files:
+            return self.send(handler, 200, self.files[parts[-2]][1], "application/octet-stream", head=head)
+        self.send(handler, 404, head=head)
+
+    def create_file(self, content_type: str, body: bytes) -> dict:
+        """Stores a multipart/form-data upload (fields `file` and `purpose`)."""
+        form = BytesParser(policy=policy.HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+        )
+        fields = {part.get_param("name", header="content-disposition"): part for part in form.iter_parts()}
+        content = fields["file"].get_payload(decode=True)
+        file_id = self._next_id("file", self.files)
+        self.files[file_id] = ({
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": fields["file"].get_filename() or "upload",
+            "purpose": fields["purpose"].get_payload(decode=True).decode("utf-8"),
+            "status": "processed",
+        }, content)
+        return self.files[file_id][0]
+
+    def create_batch(self, request: dict) -> dict:
+        lines = self.files[request["input_file_id"]][1].decode("utf-8").splitlines()
+        batch_id = self._next_id("batch", self.batches)
+        self._polls[batch_id] = 0
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "completion_window": request["completion_window"],
+            "status": "validating",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": sum(1 for line in lines if line.strip()), "completed": 0, "failed": 0},
+        }
+        return self.batches[batch_id]
+
+    def retrieve_batch(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        with self._lock:
+            self._polls[batch_id] += 1
+            polls = self._polls[batch_id]
+        if batch["status"] in ("validating", "in_progress"):
+            if polls <= self.batch_polls:
+                batch["status"] = "in_progress"
+            else:
+                self._complete_batch(batch)
+        return batch
+
+    def _complete_batch(self, batch: dict):
+        output = []
+        for n, line in enumerate(self.files[batch["input_file_id"]][1].decode("utf-8").splitlines()):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            output.append(json.dumps({
+                "id": f"batch_req_{n}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": f"req_{n}", "body": self.completion(request["body"])},
+                "error": None,
+            }, ensure_ascii=False))
+        file_id = self._next_id("file", self.files)
+        content = ("\n".join(output) + "\n").encode("utf-8")
+        self.files[file_id] = ({
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": "batch_output.jsonl",
+            "purpose": "batch_output",
+            "status": "processed",
+        }, content)
+        batch.update(
+            status="completed",
+            output_file_id=file_id,
+            request_counts={"total": len(output), "completed": len(output), "failed": 0},
+        )
+
+    def completion(self, request: dict) -> dict:
+        """A chat.completion object answering one chat-completions request body."""
+        schema = (request.get("response_format") or {}).get("json_schema", {}).get("schema", {})
+        content = {"summary": self.SUMMARY.strip(), "themes": ["Comercio exterior", "Aduanas"]}
+        if "source" in schema.get("properties", {"source": None}):
+            content["source"] = "Ministerio de Comercio, Industria y Turismo"
+        prompt_tokens = sum(len(m.get("content") or "") for m in request["messages"]) // 4
+        completion_tokens = len(json.dumps(content)) // 4
+        return {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
@@ -0,0 +1,126 @@
+"""
+Startup benchmark for watcher.py.
+
+Measures, in fresh interpreters:
+
+- `import watcher`: must stay under IMPORT_BUDGET_MS (median) and must not
+  load any of the heavy dependencies (requests, bs4, pypdf, openai, ...).
+- the "nothing new" path: run_once() against a local server that answers
+  every index page with 304 Not Modified. After the import, it must stay
+  under FAST_PATH_BUDGET_MS (median, HTTP round trip included) and must
+  not load any heavy dependency, requests included: the conditional GET
+  goes through http.client.
+
+Exits with status 1 when a budget or a lazy-import check fails, so it can
+be used as a CI gate:
+
+    python benchmarks/startup.py [--runs N] [--budget-ms MS] [--fast-path-budget-ms MS]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from stand_ins import MincitServer
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "100"))
+FAST_PATH_BUDGET_MS = float(os.getenv("FAST_PATH_BUDGET_MS", "100"))
+HEAVY_MODULES = ["requests", "bs4", "pypdf", "openai", "dotenv", "tiktoken", "smtplib", "multiprocessing"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+t = time.perf_counter()
+import watcher
+elapsed = (time.perf_counter() - t) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+FAST_PATH_SNIPPET = """
+import json, sys, time
+t = time.perf_counter()
+import watcher
+watcher.BASE_URL = %r
+t_run = time.perf_counter()
+watcher.run_once()
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t_run - t) * 1000, "run_ms": (done - t_run) * 1000, "total_ms": (done - t) * 1000,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def _run_snippet(snippet: str, cwd: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(REPO_DIR), OPENAI_API_KEY="")
+    out = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench_import(runs: int, cwd: str) -> dict:
+    samples = [_run_snippet(IMPORT_SNIPPET, cwd) for _ in range(runs)]
+    times = [s["ms"] for s in samples]
+    return {
+        "median_ms": statistics.median(times),
+        "max_ms": max(times),
+        "heavy_modules_loaded": sorted({m for s in samples for m in s["loaded"]}),
+    }
+
+
+def bench_fast_path(runs: int, cwd: str) -> dict:
+    empty_index = "<html><body><p>Sin decretos</p></body></html>"
+    with MincitServer(index_pages={year: empty_index for year in range(2000, 2100)}) as server:
+        snippet = FAST_PATH_SNIPPET % (server.index_url(), HEAVY_MODULES)
+        _run_snippet(snippet, cwd)  # first run stores the ETag
+        samples = [_run_snippet(snippet, cwd) for _ in range(runs)]
+    result = {
+        key: statistics.median(s[key] for s in samples)
+        for key in ("import_ms", "run_ms", "total_ms")
+    }
+    result["heavy_modules_loaded"] = sorted({m for s in samples for m in s["loaded"]})
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--fast-path-budget-ms", type=float, default=FAST_PATH_BUDGET_MS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        result = {
+            "import": bench_import(args.runs, cwd),
+            "fast_path": bench_fast_path(args.runs, cwd),
+            "budget_ms": args.budget_ms,
+            "fast_path_budget_ms": args.fast_path_budget_ms,
+        }
+    print(json.dumps(result, indent=2))
+
+    ok = True
+    if result["import"]["median_ms"] > args.budget_ms:
+        print(f"FAIL: import watcher took {result['import']['median_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        ok = False
+    if result["import"]["heavy_modules_loaded"]:
+        print(f"FAIL: import watcher loaded {', '.join(result['import']['heavy_modules_loaded'])}")
+        ok = False
+    fast_path = result["fast_path"]
+    if fast_path["run_ms"] > args.fast_path_budget_ms:
+        print(f"FAIL: the unchanged run took {fast_path['run_ms']:.1f} ms after the import "
+              f"(budget {args.fast_path_budget_ms:.0f} ms)")
+        ok = False
+    if fast_path["heavy_modules_loaded"]:
+        print(f"FAIL: the unchanged run loaded {', '.join(fast_path['heavy_modules_loaded'])}")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,28 @@
 import os
+import re
 import json
-import smtplib
-from email.message import EmailMessage
+import argparse
+import atexit
+import gzip
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from urllib.parse import urljoin
-from datetime import datetime
-
-import requests
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
-from pypdf import PdfReader
-from openai import OpenAI
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin, urlsplit
+from datetime import datetime, timezone
+from html import unescape as html_unescape
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# requests, pypdf, openai, tiktoken, dotenv, smtplib and the executors
+# are imported by the stage that needs them, so a run where no index page changed (and
+# `import watcher` itself) does not pay for loading them
+if TYPE_CHECKING:
+    import requests
 
 # ================== CONFIG ==================
 
@@ -20,15 +32,123 @@ YEARS = [2025]  # you can extend later: [2025, 2024, 2023, 2022]
 BASE_URL = "https://www.mincit.gov.co/normatividad/decretos/{year}"
 
 STATE_FILE = "known_files.json"
+FETCH_CACHE_FILE = "fetch_cache.json"  # legacy, only read by the SQLite migration
+STATE_DB_FILE = os.getenv("STATE_DB_FILE", "watcher_state.db")
+BATCH_STATE_FILE = "batch_state.json"
 DOWNLOAD_DIR = Path("downloads")
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 SUMMARIES_FILE = "summaries.json"
-ERROR_LOG_FILE = "error_log.log"
+# One JSON object per line: ts, level, message and, when known, stage and url
+# (error_log.log holds the free-text lines of earlier versions)
+ERROR_LOG_FILE = "error_log.jsonl"
+
+# Local caches (not committed; restored between CI runs with actions/cache)
+CACHE_DIR = Path(os.getenv("WATCHER_CACHE_DIR", ".cache"))
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# docs/ (GitHub Pages) report: "lazy" = small HTML shell + JSON data sharded by
+# year, cards rendered on scroll; "static" = the single-file report
+DOCS_REPORT_MODE = os.getenv("DOCS_REPORT_MODE", "lazy")
+# Bump when report card markup changes so cached fragments are re-rendered
+REPORT_RENDERER_VERSION = "2"
+# Bump when extraction logic changes so stale text is not reused (the cache
+# key also includes the installed pypdf version, see extractor_version)
+EXTRACTOR_REVISION = "1"
+
+# ChatGPT model used for analyses
+ANALYSIS_MODEL = "gpt-4.1-mini"
+# Cached analyses are reused for LLM_CACHE_TTL seconds (default 90 days)
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(90 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Ignore cached analyses and ask ChatGPT again (also: --refresh-llm-cache)
+LLM_CACHE_REFRESH = os.getenv("LLM_CACHE_REFRESH", "0") == "1"
+
+# Client-side OpenAI rate limits (set to your account's limits for ANALYSIS_MODEL)
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+# Completion tokens reserved per request before the real usage is known
+OPENAI_COMPLETION_TOKENS_ESTIMATE = 800
+
+# Batch API backfill (--batch): how often and how long to wait for the batch
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "60"))  # seconds
+BATCH_POLL_TIMEOUT = float(os.getenv("BATCH_POLL_TIMEOUT", str(25 * 60)))  # seconds
+
+# backfill command: each year's index page is scanned once into a persistent
+# queue (in the state database), which is then drained BACKFILL_BATCH_SIZE
+# documents at a time until it is empty or the run's time / OpenAI token
+# budget is spent (0 = no limit). A failed document is retried on later
+# runs, up to BACKFILL_MAX_ATTEMPTS times
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "16"))
+BACKFILL_TIME_BUDGET = float(os.getenv("BACKFILL_TIME_BUDGET", "0"))  # seconds
+BACKFILL_TOKEN_BUDGET = int(os.getenv("BACKFILL_TOKEN_BUDGET", "0"))
+BACKFILL_MAX_ATTEMPTS = int(os.getenv("BACKFILL_MAX_ATTEMPTS", "3"))
+
+# A decree whose download or analysis fails is retried on the next runs (even
+# if its index page did not change), up to FILE_MAX_ATTEMPTS times
+FILE_MAX_ATTEMPTS = int(os.getenv("FILE_MAX_ATTEMPTS", "3"))
+
+# Characters of document text sent to ChatGPT in a single-prompt analysis
+# (used as-is by --batch, which does not do map-reduce)
+MAX_PROMPT_CHARS = 12000
+# Long decrees are split into ~MAP_CHUNK_TOKENS chunks along ARTÍCULO/CAPÍTULO
+# headings, summarized in parallel and merged. Documents up to
+# SINGLE_PASS_TOKENS get a single request; at most MAX_DOCUMENT_TOKENS of a
+# document are summarized.
+SINGLE_PASS_TOKENS = int(os.getenv("SINGLE_PASS_TOKENS", "3000"))
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "3000"))
+MAX_DOCUMENT_TOKENS = int(os.getenv("MAX_DOCUMENT_TOKENS", "60000"))
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+# Extraction stops once it has this much text (generous chars-per-token bound)
+MAX_DOCUMENT_CHARS = MAX_DOCUMENT_TOKENS * 5
+# Opt-in: split page extraction of large PDFs across a process pool
+PDF_PARALLEL_EXTRACTION = os.getenv("PDF_PARALLEL_EXTRACTION", "0") == "1"
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# --daemon: per-URL adaptive polling interval bounds (seconds), how much an
+# unchanged check stretches the interval, random jitter (fraction) and quiet
+# hours ("start-end" in DAEMON_TIMEZONE, empty to disable) during which
+# checks are DAEMON_QUIET_FACTOR times less frequent
+DAEMON_INITIAL_INTERVAL = float(os.getenv("DAEMON_INITIAL_INTERVAL", str(30 * 60)))
+DAEMON_MIN_INTERVAL = float(os.getenv("DAEMON_MIN_INTERVAL", str(5 * 60)))
+DAEMON_MAX_INTERVAL = float(os.getenv("DAEMON_MAX_INTERVAL", str(6 * 3600)))
+DAEMON_BACKOFF_FACTOR = float(os.getenv("DAEMON_BACKOFF_FACTOR", "1.5"))
+DAEMON_JITTER = float(os.getenv("DAEMON_JITTER", "0.2"))
+DAEMON_QUIET_HOURS = os.getenv("DAEMON_QUIET_HOURS", "20-6")
+DAEMON_QUIET_FACTOR = float(os.getenv("DAEMON_QUIET_FACTOR", "4"))
+DAEMON_MAX_SLEEP = 60  # seconds; wake up regularly so Ctrl+C and clock changes are noticed
+try:
+    DAEMON_TIMEZONE = ZoneInfo(os.getenv("DAEMON_TIMEZONE", "America/Bogota"))
+except ZoneInfoNotFoundError:
+    DAEMON_TIMEZONE = None  # system local time
+
+# Revalidation of summarized attachments, in case MINCIT replaces the PDF
+# behind a URL: every REVALIDATE_INTERVAL seconds the REVALIDATE_BATCH least
+# recently checked URLs get a conditional HEAD; only those whose ETag /
+# Last-Modified / size changed are downloaded again, and only those whose
+# content hash changed are analyzed again (REVALIDATE_BATCH=0 turns it off)
+REVALIDATE_BATCH = int(os.getenv("REVALIDATE_BATCH", "20"))
+REVALIDATE_INTERVAL = float(os.getenv("REVALIDATE_INTERVAL", str(6 * 3600)))  # seconds
+
+# Run metrics (off by default, also: --metrics): per-stage timings, HTTP
+# bytes and status codes, PDF pages/characters, OpenAI latency and tokens.
+# Each run appends a JSON record to METRICS_DIR/runs.jsonl and rewrites
+# METRICS_DIR/watcher.prom (Prometheus node_exporter textfile format)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_DIR = Path(os.getenv("METRICS_DIR", "metrics"))
+METRICS_MAX_ERRORS = 100  # error messages kept in a run record
+# During a run, log_error lines are written to ERROR_LOG_FILE in batches
+ERROR_LOG_BUFFER_LINES = int(os.getenv("ERROR_LOG_BUFFER_LINES", "50"))
 
 # For now all these URLs are from MINCIT (you can introduce more sources later)
 DEFAULT_SOURCE = "Ministerio de Comercio, Industria y Turismo"
 
-# Load environment variables (.env)
-load_dotenv()
+# Load environment variables (.env), next to the script or in the working directory
+if Path(".env").exists() or Path(__file__).with_name(".env").exists():
+    from dotenv import load_dotenv
+
+    load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Email config
@@ -39,53 +159,799 @@ SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 EMAIL_FROM = os.getenv("EMAIL_FROM")
 EMAIL_TO = os.getenv("EMAIL_TO")  # can be comma-separated
 
+# HTTP client config (shared by page fetches and downloads)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1.0"))  # seconds
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "60"))  # seconds
+HTTP_MAX_CONCURRENCY_PER_HOST = int(os.getenv("HTTP_MAX_CONCURRENCY_PER_HOST", "4"))
+HTTP_MIN_INTERVAL_PER_HOST = float(os.getenv("HTTP_MIN_INTERVAL_PER_HOST", "0.25"))  # seconds between requests
+# HTTP archive: "record" saves every response (index pages and PDFs) to
+# HTTP_ARCHIVE_DIR, "replay" serves them from there without touching the
+# network (also: --record-http / --replay-http). Empty = off
+HTTP_ARCHIVE_MODE = os.getenv("HTTP_ARCHIVE_MODE", "")
+HTTP_ARCHIVE_DIR = Path(os.getenv("HTTP_ARCHIVE_DIR", "http_archive"))
+
+# Pipeline concurrency (download → extract → analyze), one limit per stage
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", "4"))
+
+BROWSER_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
+}
+
 if not OPENAI_API_KEY:
     print("⚠️  WARNING: OPENAI_API_KEY not set in .env. Summaries will be skipped.")
 
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-
 
 # ================== LOGGING ==================
 
-def log_error(message: str):
-    """Append a timestamped error message to ERROR_LOG_FILE."""
-    ts = datetime.utcnow().isoformat() + "Z"
-    line = f"[{ts}] {message}\n"
+_error_log_buffer = None  # lines not yet written, while buffering (see buffer_error_log)
+_error_log_lock = threading.Lock()
+
+
+def _write_error_lines(lines: list):
     try:
         with open(ERROR_LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(line)
+            f.writelines(lines)
     except Exception:
-        # As a last resort, at least print it
-        print("❌ Could not write to error log:", line)
+        # As a last resort, at least print them
+        print("❌ Could not write to error log:", "".join(lines))
+
+
+def log_error(message: str, stage: str | None = None, url: str | None = None, level: str = "error"):
+    """
+    Append a timestamped record {ts, level, stage, url, message} to
+    ERROR_LOG_FILE (as a JSON line; stage and url only when given) and to the
+    run's metrics. While buffering, lines are written ERROR_LOG_BUFFER_LINES
+    at a time instead of opening the file for every message.
+    """
+    record = {"ts": datetime.utcnow().isoformat() + "Z", "level": level}
+    if stage:
+        record["stage"] = stage
+    if url:
+        record["url"] = url
+    record["message"] = message
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    get_metrics().error(record)
+    with _error_log_lock:
+        if _error_log_buffer is None:
+            _write_error_lines([line])
+            return
+        _error_log_buffer.append(line)
+        if len(_error_log_buffer) >= ERROR_LOG_BUFFER_LINES:
+            _write_error_lines(_error_log_buffer)
+            _error_log_buffer.clear()
+
+
+def buffer_error_log():
+    """Buffers log_error lines in memory until flush_error_log(stop=True)."""
+    global _error_log_buffer
+    with _error_log_lock:
+        if _error_log_buffer is None:
+            _error_log_buffer = []
+
+
+def flush_error_log(stop: bool = False):
+    """Writes buffered log_error lines; with stop, later lines are written right away."""
+    global _error_log_buffer
+    with _error_log_lock:
+        if _error_log_buffer:
+            _write_error_lines(_error_log_buffer)
+            _error_log_buffer.clear()
+        if stop:
+            _error_log_buffer = None
+
+
+atexit.register(flush_error_log, True)
+
+
+# ================== METRICS ==================
+
+class Metrics:
+    """
+    Counters and timings of one run, shared by every thread.
+
+    Metrics are named by plain strings and labeled with keyword arguments,
+    e.g. inc("http_bytes", n, kind="pdf") or
+    `with timer("stage", stage="scrape"):`. A timing keeps the count, total
+    and maximum seconds per name and labels. snapshot() returns everything
+    as JSON-friendly lists; merge() adds a snapshot taken in a worker process.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters = {}
+        self.timings = {}
+        self.errors = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            count, total, longest = self.timings.get(key, (0, 0.0, 0.0))
+            self.timings[key] = (count + 1, total + seconds, max(longest, seconds))
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def error(self, record: dict):
+        with self._lock:
+            if len(self.errors) < METRICS_MAX_ERRORS:
+                self.errors.append(record)
+        self.inc("errors")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "timings": [
+                    {"name": name, "labels": dict(labels), "count": count,
+                     "seconds": round(total, 6), "max_seconds": round(longest, 6)}
+                    for (name, labels), (count, total, longest) in sorted(self.timings.items())
+                ],
+                "errors": list(self.errors),
+            }
+
+    def merge(self, snapshot: dict | None):
+        if not snapshot:
+            return
+        for c in snapshot["counters"]:
+            self.inc(c["name"], c["value"], **c["labels"])
+        with self._lock:
+            for t in snapshot["timings"]:
+                key = self._key(t["name"], t["labels"])
+                count, total, longest = self.timings.get(key, (0, 0.0, 0.0))
+                self.timings[key] = (count + t["count"], total + t["seconds"], max(longest, t["max_seconds"]))
+            self.errors.extend(snapshot["errors"][:METRICS_MAX_ERRORS - len(self.errors)])
+
+    def run_record(self, info: dict) -> dict:
+        """The JSON run record: `info` (status, years, counts...) plus the metrics."""
+        finished = time.time()
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "finished_at": datetime.fromtimestamp(finished, timezone.utc).isoformat(),
+            "duration_seconds": round(finished - self.started_at, 3),
+            **info,
+            **self.snapshot(),
+        }
+
+
+class _NullMetrics:
+    """Used when metrics are off: every call is a no-op."""
+
+    enabled = False
+    _timer = nullcontext()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        pass
+
+    def observe(self, name: str, seconds: float, **labels):
+        pass
+
+    def timer(self, name: str, **labels):
+        return self._timer
+
+    def error(self, record: dict):
+        pass
+
+    def snapshot(self):
+        return None
+
+    def merge(self, snapshot: dict | None):
+        pass
+
+
+_NULL_METRICS = _NullMetrics()
+_metrics = _NULL_METRICS
+
+
+def get_metrics():
+    """Metrics of the current run (a no-op collector when metrics are off)."""
+    return _metrics
+
+
+def start_metrics(enabled: bool | None = None):
+    """Starts collecting a fresh set of metrics (default: if METRICS_ENABLED)."""
+    global _metrics
+    if enabled is None:
+        enabled = METRICS_ENABLED
+    _metrics = Metrics() if enabled else _NULL_METRICS
+    return _metrics
+
+
+def _prometheus_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def prometheus_text(record: dict) -> str:
+    """
+    A run record in Prometheus text format, as gauges describing the last
+    run: watcher_last_run_<counter> and, for timings,
+    watcher_last_run_<timing>_seconds_{sum,count,max}.
+    """
+    prefix = "watcher_last_run_"
+    series = {}  # metric name -> [(labels, value)]
+    series[prefix + "timestamp_seconds"] = [({}, datetime.fromisoformat(record["finished_at"]).timestamp())]
+    series[prefix + "duration_seconds"] = [({}, record["duration_seconds"])]
+    series[prefix + "success"] = [({}, 0 if record.get("status") == "error" else 1)]
+    for c in record["counters"]:
+        series.setdefault(prefix + c["name"], []).append((c["labels"], c["value"]))
+    for t in record["timings"]:
+        base = prefix + t["name"] + "_seconds"
+        series.setdefault(base + "_sum", []).append((t["labels"], t["seconds"]))
+        series.setdefault(base + "_count", []).append((t["labels"], t["count"]))
+        series.setdefault(base + "_max", []).append((t["labels"], t["max_seconds"]))
+
+    lines = []
+    for name, samples in series.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{_prometheus_labels(labels)} {value}" for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(record: dict, directory: Path | None = None) -> Path:
+    """Appends the run record to <dir>/runs.jsonl and rewrites <dir>/watcher.prom."""
+    directory = directory or METRICS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "runs.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    # Written aside and renamed, so the textfile collector never reads half a file
+    prom_path = directory / "watcher.prom"
+    tmp_path = prom_path.with_name(prom_path.name + ".tmp")
+    tmp_path.write_text(prometheus_text(record), encoding="utf-8")
+    os.replace(tmp_path, prom_path)
+    return directory
+
+
+def finish_metrics(info: dict):
+    """Writes the current run's metrics (if they are on) with `info` as run details."""
+    metrics = get_metrics()
+    if not metrics.enabled:
+        return
+    try:
+        directory = write_metrics(metrics.run_record(info))
+        print(f"📈 Metrics written to {directory}/")
+    except Exception as e:
+        log_error(f"Could not write metrics to {METRICS_DIR}: {e}", stage="metrics", level="warning")
+
+
+# ================== HTTP CLIENT ==================
+
+class _HostLimiter:
+    """Caps concurrent requests and request rate for a single host."""
+
+    def __init__(self, max_concurrency: int, min_interval: float):
+        self.semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def acquire(self):
+        self.semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self):
+        self.semaphore.release()
+
+
+class HttpClient:
+    """
+    Shared HTTP client for everything the watcher downloads.
+
+    - One requests.Session, so connections to www.mincit.gov.co are kept alive
+      and reused instead of paying a TCP/TLS handshake per request.
+    - Retries connection errors, timeouts, 429 and 5xx responses with jittered
+      exponential backoff, honoring Retry-After when the server sends it.
+    - Per-host cap on in-flight requests and on request rate.
+    - Optionally records responses to, or replays them from, an HttpArchive.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_base: float = HTTP_BACKOFF_BASE,
+        backoff_max: float = HTTP_BACKOFF_MAX,
+        max_concurrency_per_host: int = HTTP_MAX_CONCURRENCY_PER_HOST,
+        min_interval_per_host: float = HTTP_MIN_INTERVAL_PER_HOST,
+        archive: "HttpArchive | None" = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.min_interval_per_host = min_interval_per_host
+        self.archive = archive
+
+        import requests
+
+        self.session = requests.Session()
+        pool_size = max(1, max_concurrency_per_host) * 2
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(BROWSER_HEADERS)
+
+        self._limiters: dict[str, _HostLimiter] = {}
+        self._limiters_lock = threading.Lock()
+
+    def _limiter(self, url: str) -> _HostLimiter:
+        host = urlsplit(url).netloc.lower()
+        with self._limiters_lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = _HostLimiter(self.max_concurrency_per_host, self.min_interval_per_host)
+                self._limiters[host] = limiter
+            return limiter
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, resp) -> float | None:
+        value = resp.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            from email.utils import parsedate_to_datetime
+
+            try:
+                when = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            seconds = (when - datetime.now(timezone.utc)).total_seconds()
+        return min(self.backoff_max, max(0.0, seconds))
+
+    def request(self, method: str, url: str, **kwargs) -> "requests.Response":
+        """
+        Like requests.request, but pooled, rate-limited and retried.
+        After the last attempt the final response is returned as-is (callers
+        still call raise_for_status) and the final network error is re-raised.
+        """
+        import requests
+
+        if self.archive is not None:
+            if self.archive.mode == "replay":
+                return self.archive.replay(method, url, kwargs.get("headers"))
+            # Full bodies only, so the archive can answer any later request
+            kwargs["headers"] = self.archive.unconditional(kwargs.get("headers"))
+
+        metrics = get_metrics()
+        limiter = self._limiter(url)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            start = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.inc("http_errors", method=method, error=type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                reason = str(e)
+            else:
+                # Time to response headers (streamed bodies are read by the caller)
+                metrics.observe("http_request", time.perf_counter() - start, method=method)
+                metrics.inc("http_responses", method=method, status=resp.status_code)
+                if resp.status_code not in self.RETRY_STATUSES or attempt >= self.max_retries:
+                    if self.archive is not None:
+                        self.archive.record(method, url, resp)
+                    return resp
+                delay = self._retry_after(resp)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                reason = f"HTTP {resp.status_code}"
+                resp.close()
+            finally:
+                limiter.release()
+
+            attempt += 1
+            metrics.inc("http_retries", method=method)
+            print(f"   ↻ Retry {attempt}/{self.max_retries} for {url} in {delay:.1f}s ({reason})")
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("HEAD", url, **kwargs)
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def probe_not_modified(url: str, headers: dict, timeout: float = 15) -> bool:
+    """
+    One conditional GET with the standard library's http.client. Returns
+    True only if the server answered 304 Not Modified. Meant for the first
+    request of a run, before the shared HttpClient exists: importing
+    requests takes longer than the rest of a "nothing new" run. Anything
+    else (a changed page, an error, a proxy to go through) returns False,
+    and the caller makes the request through get_http_client().
+    """
+    if any(os.environ.get(name) for name in ("https_proxy", "HTTPS_PROXY", "http_proxy", "HTTP_PROXY")):
+        return False
+    import http.client
+
+    parts = urlsplit(url)
+    if parts.scheme == "https":
+        conn = http.client.HTTPSConnection(parts.netloc, timeout=timeout)
+    elif parts.scheme == "http":
+        conn = http.client.HTTPConnection(parts.netloc, timeout=timeout)
+    else:
+        return False
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    start = time.perf_counter()
+    try:
+        conn.request("GET", path, headers={**BROWSER_HEADERS, **headers, "Accept-Encoding": "identity"})
+        status = conn.getresponse().status
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()  # a changed page's body is left unread
+    metrics = get_metrics()
+    metrics.observe("http_request", time.perf_counter() - start, method="GET")
+    metrics.inc("http_responses", method="GET", status=status)
+    return status == 304
+
+
+def get_http_client() -> HttpClient:
+    """Returns the process-wide HttpClient, creating it on first use."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            archive = HttpArchive(HTTP_ARCHIVE_DIR, HTTP_ARCHIVE_MODE) if HTTP_ARCHIVE_MODE else None
+            _http_client = HttpClient(archive=archive)
+        return _http_client
+
+
+# ================== HTTP ARCHIVE ==================
+
+class HttpArchive:
+    """
+    Record/replay archive of HTTP responses, for re-running the pipeline on
+    real MINCIT traffic offline (e.g. to profile it, or to analyze again
+    after a prompt change).
+
+    - bodies/<aa>/<sha256>.gz: each distinct body once, gzip-compressed
+    - index.jsonl: one line per recorded response (method, URL, status,
+      headers, body hash, time); for a URL recorded several times the last
+      line wins
+
+    In "replay" mode responses are rebuilt from the archive: conditional
+    requests get a 304 when the archived ETag / Last-Modified match, HEAD
+    falls back to the archived GET, and anything not archived is a 404.
+    """
+
+    INDEX_FILE = "index.jsonl"
+    # requests decodes the body, so these no longer describe what we store
+    DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+    CONDITIONAL_HEADERS = {"if-none-match", "if-modified-since", "range"}
+
+    def __init__(self, directory: Path, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown HTTP archive mode: {mode!r} (expected 'record' or 'replay')")
+        self.directory = Path(directory)
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.entries = self._load_index()
+        if mode == "replay":
+            print(f"📼 Replaying {len(self.entries)} HTTP response(s) from {self.directory}/")
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            print(f"📼 Recording HTTP responses to {self.directory}/")
+
+    def _body_path(self, sha256: str) -> Path:
+        return self.directory / "bodies" / sha256[:2] / f"{sha256}.gz"
+
+    def _load_index(self) -> dict:
+        entries = {}
+        path = self.directory / self.INDEX_FILE
+        if not path.exists():
+            return entries
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+                entries[(entry["method"], entry["url"])] = entry
+        return entries
+
+    @classmethod
+    def unconditional(cls, headers: dict | None) -> dict:
+        return {k: v for k, v in (headers or {}).items() if k.lower() not in cls.CONDITIONAL_HEADERS}
+
+    def record(self, method: str, url: str, resp):
+        """Archives a final response (reads the whole body, even of a streamed one)."""
+        if resp.status_code == 304 or resp.status_code >= 500:
+            return
+        body = resp.content
+        digest = hashlib.sha256(body).hexdigest()
+        size = len(body)
+        if method == "HEAD":
+            # No body: keep the length of the one the server announced, so a
+            # replayed HEAD reports the same Content-Length (see check_attachment)
+            length = resp.headers.get("Content-Length", "")
+            size = int(length) if length.isdigit() else None
+        previous = self.entries.get((method, url))
+        if (previous and previous["sha256"] == digest and previous["status"] == resp.status_code
+                and previous["size"] == size):
+            return  # already archived as-is
+        body_path = self._body_path(digest)
+        if not body_path.exists():
+            body_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = body_path.with_name(f"{body_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with gzip.open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, body_path)
+
+        entry = {
+            "method": method,
+            "url": url,
+            "status": resp.status_code,
+            "reason": resp.reason,
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() not in self.DROPPED_HEADERS},
+            "sha256": digest,
+            "size": size,
+            "recorded_at": datetime.utcnow().isoformat() + "Z",
+        }
+        with self._lock:
+            self.entries[(method, url)] = entry
+            with open(self.directory / self.INDEX_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        get_metrics().inc("http_archive", result="recorded")
+
+    def replay(self, method: str, url: str, headers: dict | None = None) -> "requests.Response":
+        import requests
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+
+        entry = self.entries.get((method, url))
+        if entry is None and method == "HEAD":
+            entry = self.entries.get(("GET", url))
+        get_metrics().inc("http_archive", result="hit" if entry else "miss")
+
+        resp = requests.Response()
+        resp.url = url
+        resp._content_consumed = True
+        if entry is None:
+            resp.status_code = 404
+            resp.reason = "Not in HTTP archive"
+            resp.headers = CaseInsensitiveDict()
+            resp._content = b""
+            return resp
+
+        resp.headers = CaseInsensitiveDict(entry["headers"])
+        request_headers = CaseInsensitiveDict(headers or {})
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if entry["status"] == 200 and (
+            (etag and request_headers.get("If-None-Match") == etag)
+            or (last_modified and request_headers.get("If-Modified-Since") == last_modified)
+        ):
+            resp.status_code = 304
+            resp.reason = "Not Modified"
+            resp._content = b""
+            return resp
+
+        resp.status_code = entry["status"]
+        resp.reason = entry.get("reason")
+        if method == "HEAD":
+            resp._content = b""
+        else:
+            with gzip.open(self._body_path(entry["sha256"]), "rb") as f:
+                resp._content = f.read()
+        if entry["size"] is not None:
+            resp.headers["Content-Length"] = str(entry["size"])
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        return resp
+
+
+# ================== DISK CACHE ==================
+
+class DiskCache:
+    """
+    A directory of gzip-compressed JSON values addressed by a hex key, with
+    an optional TTL and least-recently-used eviction once the directory
+    grows past max_bytes. Writes go through a temp file + rename, so several
+    processes can share one cache directory.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, ttl: float | None = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json.gz"
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError) as e:
+            log_error(f"Discarding corrupt cache entry {path}: {e}", stage="cache", level="warning")
+            path.unlink(missing_ok=True)
+            return None
+
+        if self.ttl is not None and time.time() - entry.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return entry.get("value")
+
+    def put(self, key: str, value):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for path in self.directory.glob("*/*.json.gz"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+
+        # Oldest first, down to 90% of the budget so we don't evict on every put
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+_text_cache = None
+
+
+def get_text_cache() -> DiskCache:
+    global _text_cache
+    if _text_cache is None:
+        _text_cache = DiskCache(CACHE_DIR / "text", TEXT_CACHE_MAX_BYTES)
+    return _text_cache
+
+
+_llm_cache = None
+
+
+def get_llm_cache() -> DiskCache:
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = DiskCache(CACHE_DIR / "llm", LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL)
+    return _llm_cache
+
+
+def llm_cache_key(model: str, messages: list, document_hash: str) -> str:
+    """Cache key from model, whitespace-normalized prompt and document hash."""
+    normalized = "\n".join(
+        f"{m['role']}:{' '.join(m['content'].split())}" for m in messages
+    )
+    prompt_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{model}\n{prompt_hash}\n{document_hash}".encode("utf-8")).hexdigest()
 
 
 # ================== BASIC SCRAPING ==================
 
-def fetch_page(url: str) -> str:
+def fetch_page(url: str, cache: dict | None = None) -> str | None:
     """
-    Download the HTML for a given URL, pretending to be a real browser,
+    Download the HTML for a given URL through the shared HTTP client
+    (which presents itself as a real browser),
     and save it to debug.html so we can see what the server is returning.
+
+    If a fetch cache dict is given, the request is made conditional
+    (If-None-Match / If-Modified-Since) and None is returned when the page
+    is unchanged, either because the server answered 304 or because the body
+    hashes to the same value as last time. The cache entry for the URL is
+    updated in place.
     """
     print(f"→ Fetching page: {url}")
 
     headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        ),
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
-        "Connection": "keep-alive",
     }
 
+    cached = cache.get(url, {}) if cache is not None else {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    validators = cached.get("etag") or cached.get("last_modified")
+    if validators and _http_client is None and not HTTP_ARCHIVE_MODE:
+        # Nothing else fetched yet (a regular cron run): most of the time the
+        # page is unchanged, and this answers that without importing requests
+        if probe_not_modified(url, headers):
+            print("   ✓ Not modified (304)")
+            get_metrics().inc("index_pages", result="not_modified")
+            return None
+
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = get_http_client().get(url, headers=headers, timeout=30)
+        if resp.status_code == 304 and cached:
+            print("   ✓ Not modified (304)")
+            get_metrics().inc("index_pages", result="not_modified")
+            return None
         resp.raise_for_status()
     except Exception as e:
-        log_error(f"Error fetching page {url}: {e}")
+        log_error(f"Error fetching page {url}: {e}", stage="scrape", url=url)
         raise
 
+    get_metrics().inc("http_bytes", len(resp.content), kind="index")
+    body_hash = hashlib.sha256(resp.content).hexdigest()
+    if cache is not None:
+        cache[url] = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "sha256": body_hash,
+        }
+        if cached.get("sha256") == body_hash:
+            print("   ✓ Unchanged (same content hash)")
+            get_metrics().inc("index_pages", result="same_hash")
+            return None
+
+    get_metrics().inc("index_pages", result="changed")
     html = resp.text
 
     # Save for inspection if needed
@@ -95,16 +961,40 @@ def fetch_page(url: str) -> str:
     return html
 
 
+# Link-only scan of index pages: instead of building a document tree, find
+# the <a ...> start tags with a compiled pattern and read their href the way
+# html.parser does (last href wins, entities decoded). Comments and
+# <script>/<style> bodies are skipped first since they are not markup.
+NON_MARKUP_RE = re.compile(
+    r"<!--.*?(?:-->|\Z)|<(script|style)(?=[\s/>])[^>]*>.*?(?:</\1\s*>|\Z)",
+    re.IGNORECASE | re.DOTALL,
+)
+ANCHOR_TAG_RE = re.compile(r"""<a(?=[\s/>])((?:[^>"']|"[^"]*"|'[^']*')*)>""", re.IGNORECASE)
+TAG_ATTR_RE = re.compile(r"""([^\s/>"'=][^\s/=>]*)(?:\s*=+\s*("[^"]*"|'[^']*'|(?!['"])[^>\s]*))?""")
+
+
+def _anchor_hrefs(html: str):
+    """Yields the href of every <a> element that has one, in document order."""
+    for tag in ANCHOR_TAG_RE.finditer(NON_MARKUP_RE.sub(" ", html)):
+        href = None
+        for name, value in TAG_ATTR_RE.findall(tag.group(1)):
+            if name.lower() == "href":
+                href = value
+        if href is not None:
+            if href[:1] in ("'", '"'):
+                href = href[1:-1]
+            yield html_unescape(href)
+
+
 def extract_decree_files(html: str, base_url: str):
     """
     Extract document links from the page.
     Mincit uses /getattachment/.../Decreto-XXXX.aspx which serves a PDF.
     """
-    soup = BeautifulSoup(html, "html.parser")
     files = []
 
-    for a in soup.find_all("a", href=True):
-        href = str(a["href"]).strip()
+    for href in _anchor_hrefs(html):
+        href = href.strip()
 
         # In the page the docs look like /getattachment/.../Decreto-XXX.aspx
         if "/getattachment/" in href and href.lower().endswith(".aspx"):
@@ -121,106 +1011,1352 @@ def extract_decree_files(html: str, base_url: str):
 
 
 # ================== STATE HANDLING ==================
-
-def load_known_files():
-    path = Path(STATE_FILE)
+#
+# State lives in a SQLite database (WAL mode) instead of being rewritten as
+# whole JSON files on every run. load_*/save_* keep their dict-based API:
+# the store remembers what it last loaded or saved and save_* only upserts
+# (or deletes) the rows that changed, in one transaction.
+# known_files.json and summaries.json are still produced by
+# export_state_json() as the committed, human-readable artifacts, and are
+# imported once when the database is first created.
+
+def _read_json_state(filename: str, label: str) -> dict:
+    path = Path(filename)
     if not path.exists():
         return {}
     try:
         with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
     except json.JSONDecodeError as e:
-        log_error(f"{STATE_FILE} is empty or invalid JSON: {e}. Resetting state.")
+        log_error(f"{filename} is empty or invalid JSON: {e}. Resetting {label}.", stage="state")
         return {}
 
 
+def write_text_if_changed(path: Path, text: str) -> bool:
+    """
+    Atomically writes text to path (temp file + rename) unless the file
+    already has exactly these contents. Returns True if the file was written.
+    """
+    path = Path(path)
+    data = text.encode("utf-8")
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+class StateStore:
+    """SQLite-backed store for known files, summaries and index fetch metadata."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS documents (
+        url        TEXT PRIMARY KEY,
+        name       TEXT NOT NULL,
+        year       INTEGER,
+        sha256     TEXT,
+        data       TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS documents_year ON documents(year);
+    CREATE INDEX IF NOT EXISTS documents_sha256 ON documents(sha256);
+
+    CREATE TABLE IF NOT EXISTS analyses (
+        url        TEXT PRIMARY KEY,
+        name       TEXT,
+        year       INTEGER,
+        source     TEXT,
+        sha256     TEXT,
+        summary    TEXT,
+        themes     TEXT,
+        data       TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS analyses_year ON analyses(year);
+    CREATE INDEX IF NOT EXISTS analyses_source ON analyses(source);
+    CREATE INDEX IF NOT EXISTS analyses_sha256 ON analyses(sha256);
+
+    CREATE TABLE IF NOT EXISTS fetch_meta (
+        url           TEXT PRIMARY KEY,
+        etag          TEXT,
+        last_modified TEXT,
+        sha256        TEXT,
+        data          TEXT NOT NULL,
+        updated_at    TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS journal (
+        seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+        url        TEXT NOT NULL,
+        document   TEXT NOT NULL,
+        analysis   TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS meta (
+        key   TEXT PRIMARY KEY,
+        value TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS backfill_queue (
+        url          TEXT PRIMARY KEY,
+        year         INTEGER,
+        document     TEXT NOT NULL,
+        status       TEXT NOT NULL,  -- pending | done | failed
+        attempts     INTEGER NOT NULL DEFAULT 0,
+        attempted_at TEXT,
+        enqueued_at  TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS backfill_queue_status ON backfill_queue(status, year);
+
+    CREATE TABLE IF NOT EXISTS backfill_years (
+        year       INTEGER PRIMARY KEY,
+        files      INTEGER NOT NULL,
+        scanned_at TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS failed_files (
+        url          TEXT PRIMARY KEY,
+        document     TEXT NOT NULL,
+        attempts     INTEGER NOT NULL,
+        attempted_at TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.lock = threading.RLock()
+        # table -> {url: serialized row data} as last loaded/saved
+        self._snapshots = {}
+
+    def transaction(self):
+        """Context manager: BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error)."""
+        store = self
+
+        class _Tx:
+            def __enter__(self):
+                store.lock.acquire()
+                store.conn.execute("BEGIN IMMEDIATE")
+                return store.conn
+
+            def __exit__(self, exc_type, exc, tb):
+                try:
+                    store.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                finally:
+                    store.lock.release()
+                return False
+
+        return _Tx()
+
+    def get_meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO meta(key, value) VALUES(?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    # --- generic dict <-> table sync ---
+
+    # Tables whose values repeat the key as value["url"]: stored once, in the url column
+    URL_IN_VALUE = {"documents"}
+
+    def _decode(self, table: str, url: str, data: str) -> dict:
+        value = json.loads(data)
+        if table in self.URL_IN_VALUE:
+            value = {"url": url, **value}
+        return value
+
+    def _encode(self, table: str, value: dict) -> str:
+        if table in self.URL_IN_VALUE:
+            value = {k: v for k, v in value.items() if k != "url"}
+        return json.dumps(value, ensure_ascii=False)
+
+    def _rows(self, table: str) -> list:
+        with self.lock:
+            return self.conn.execute(f"SELECT url, data FROM {table} ORDER BY rowid").fetchall()
+
+    def _load(self, table: str) -> dict:
+        rows = self._rows(table)
+        result = {url: self._decode(table, url, data) for url, data in rows}
+        self._snapshots[table] = {url: data for url, data in rows}
+        return result
+
+    def _save(self, table: str, items: dict, row_fn) -> int:
+        """
+        Upserts rows whose serialized data differs from the snapshot and
+        deletes rows no longer present. row_fn(url, value) returns the
+        indexed columns as a dict. Returns the number of rows touched.
+        """
+        if table not in self._snapshots:
+            self._load(table)
+        previous = self._snapshots[table]
+        now = datetime.utcnow().isoformat() + "Z"
+        changed = {}
+        for url, value in items.items():
+            data = self._encode(table, value)
+            if previous.get(url) != data:
+                changed[url] = (value, data)
+        removed = [url for url in previous if url not in items]
+        if not changed and not removed:
+            return 0
+
+        with self.transaction() as conn:
+            for url, (value, data) in changed.items():
+                cols = row_fn(url, value)
+                cols.update({"url": url, "data": data, "updated_at": now})
+                names = ", ".join(cols)
+                marks = ", ".join("?" for _ in cols)
+                updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c != "url")
+                conn.execute(
+                    f"INSERT INTO {table}({names}) VALUES({marks}) "
+                    f"ON CONFLICT(url) DO UPDATE SET {updates}",
+                    list(cols.values()),
+                )
+            for url in removed:
+                conn.execute(f"DELETE FROM {table} WHERE url = ?", (url,))
+
+        for url, (_, data) in changed.items():
+            previous[url] = data
+        for url in removed:
+            previous.pop(url, None)
+        return len(changed) + len(removed)
+
+    @staticmethod
+    def _document_row(url: str, info: dict) -> dict:
+        return {
+            "name": info.get("name") or url.split("/")[-1],
+            "year": info.get("year"),
+            "sha256": info.get("sha256"),
+        }
+
+    @staticmethod
+    def _analysis_row(url: str, info: dict) -> dict:
+        return {
+            "name": info.get("name"),
+            "year": info.get("year"),
+            "source": info.get("source"),
+            "sha256": info.get("sha256"),
+            "summary": info.get("summary"),
+            "themes": json.dumps(info.get("themes") or [], ensure_ascii=False),
+        }
+
+    @staticmethod
+    def _fetch_row(url: str, info: dict) -> dict:
+        return {
+            "etag": info.get("etag"),
+            "last_modified": info.get("last_modified"),
+            "sha256": info.get("sha256"),
+        }
+
+    def load_documents(self) -> dict:
+        return self._load("documents")
+
+    def save_documents(self, items: dict) -> int:
+        return self._save("documents", items, self._document_row)
+
+    def load_analyses(self) -> dict:
+        return self._load("analyses")
+
+    def save_analyses(self, items: dict) -> int:
+        return self._save("analyses", items, self._analysis_row)
+
+    def load_fetch_meta(self) -> dict:
+        return self._load("fetch_meta")
+
+    def save_fetch_meta(self, items: dict) -> int:
+        return self._save("fetch_meta", items, self._fetch_row)
+
+    # --- per-file journal ---
+
+    def append_journal(self, url: str, document: dict, analysis: dict):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO journal(url, document, analysis, created_at) VALUES(?, ?, ?, ?)",
+                (
+                    url,
+                    json.dumps(document, ensure_ascii=False),
+                    json.dumps(analysis, ensure_ascii=False),
+                    datetime.utcnow().isoformat() + "Z",
+                ),
+            )
+
+    def read_journal(self) -> list:
+        with self.lock:
+            rows = self.conn.execute("SELECT url, document, analysis FROM journal ORDER BY seq").fetchall()
+        return [(url, json.loads(document), json.loads(analysis)) for url, document, analysis in rows]
+
+    def journal_size(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+
+    def clear_journal(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM journal")
+
+    # --- failed files ---
+
+    def load_failures(self) -> dict:
+        """{url: (file_info dict, failed attempts)}"""
+        with self.lock:
+            rows = self.conn.execute("SELECT url, document, attempts FROM failed_files").fetchall()
+        return {url: (json.loads(document), attempts) for url, document, attempts in rows}
+
+    def record_failures(self, files: list):
+        """Counts one more failed attempt for each file (file_info dicts)."""
+        now = datetime.utcnow().isoformat() + "Z"
+        with self.transaction() as conn:
+            for f in files:
+                conn.execute(
+                    "INSERT INTO failed_files(url, document, attempts, attempted_at) VALUES(?, ?, 1, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET document = excluded.document, "
+                    "attempts = attempts + 1, attempted_at = excluded.attempted_at",
+                    (f["url"], json.dumps(f, ensure_ascii=False), now),
+                )
+
+    def clear_failures(self, urls: list):
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM failed_files WHERE url = ?", [(url,) for url in urls])
+
+    # --- backfill queue ---
+
+    def backfill_scanned_years(self) -> set:
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT year FROM backfill_years")}
+
+    def enqueue_backfill(self, year: int, files: list, total: int) -> int:
+        """
+        Queues files (file_info dicts) of one year's index page, which listed
+        `total` decrees, and marks the year as scanned. Already queued URLs
+        are left as they are. Returns how many files were added.
+        """
+        now = datetime.utcnow().isoformat() + "Z"
+        with self.transaction() as conn:
+            added = 0
+            for f in files:
+                added += conn.execute(
+                    "INSERT OR IGNORE INTO backfill_queue(url, year, document, status, enqueued_at) "
+                    "VALUES(?, ?, ?, 'pending', ?)",
+                    (f["url"], year, json.dumps(f, ensure_ascii=False), now),
+                ).rowcount
+            conn.execute(
+                "INSERT INTO backfill_years(year, files, scanned_at) VALUES(?, ?, ?) "
+                "ON CONFLICT(year) DO UPDATE SET files = excluded.files, scanned_at = excluded.scanned_at",
+                (year, total, now),
+            )
+        return added
+
+    def next_backfill_items(self, limit: int, attempted_before: str) -> list:
+        """
+        Up to `limit` pending file_info dicts, newest year first, skipping
+        files already attempted since `attempted_before` (i.e. in this run).
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT document FROM backfill_queue "
+                "WHERE status = 'pending' AND (attempted_at IS NULL OR attempted_at < ?) "
+                "ORDER BY year DESC, enqueued_at, url LIMIT ?",
+                (attempted_before, limit),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def finish_backfill_item(self, url: str):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE backfill_queue SET status = 'done', attempted_at = ? WHERE url = ?",
+                (datetime.utcnow().isoformat() + "Z", url),
+            )
+
+    def fail_backfill_item(self, url: str, max_attempts: int):
+        """Counts a failed attempt; after max_attempts the file is given up on."""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE backfill_queue SET attempts = attempts + 1, attempted_at = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE url = ?",
+                (datetime.utcnow().isoformat() + "Z", max_attempts, url),
+            )
+
+    def backfill_counts(self) -> dict:
+        """{status: number of queued files}"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM backfill_queue GROUP BY status"))
+
+    # --- full-text search ---
+
+    SEARCH_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS search_docs (
+        id          INTEGER PRIMARY KEY,
+        url         TEXT NOT NULL UNIQUE,
+        year        INTEGER,
+        source      TEXT,
+        themes      TEXT,
+        has_text    INTEGER NOT NULL,
+        analysis_at TEXT NOT NULL,
+        text_generation INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS search_docs_year ON search_docs(year);
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        name, summary, themes, body,
+        tokenize = "unicode61 remove_diacritics 2"
+    );
+    """
+
+    # bm25() column weights for name, summary, themes, body
+    SEARCH_WEIGHTS = (8.0, 4.0, 6.0, 1.0)
+
+    def _ensure_search(self):
+        if not getattr(self, "_search_ready", False):
+            with self.lock:
+                self.conn.executescript(self.SEARCH_SCHEMA)
+                columns = {row[1] for row in self.conn.execute("PRAGMA table_info(search_docs)")}
+                if "text_generation" not in columns:  # indexes built by earlier versions
+                    self.conn.execute(
+                        "ALTER TABLE search_docs ADD COLUMN text_generation INTEGER NOT NULL DEFAULT 0"
+                    )
+                self.conn.create_function("fold", 1, fold_text, deterministic=True)
+            self._search_ready = True
+
+    def update_search_index(self, text_fn, probe_text: bool = True) -> int:
+        """
+        Brings the search index in line with the analyses table: (re)indexes
+        analyses updated since they were last indexed and drops removed ones.
+        With probe_text, documents indexed without their PDF text are looked
+        up again in the text cache, but only if text was cached since they
+        were last checked (see TEXT_GENERATION_KEY).
+        text_fn(sha256) returns the cached full text of a PDF, or None.
+        Returns the number of documents touched.
+        """
+        self._ensure_search()
+        generation = int(self.get_meta(TEXT_GENERATION_KEY) or 0)
+        sql = (
+            "SELECT a.url, a.name, a.year, a.source, a.sha256, a.summary, a.themes, a.updated_at, "
+            "d.id, d.has_text, d.analysis_at "
+            "FROM analyses a LEFT JOIN search_docs d ON d.url = a.url "
+            "WHERE d.id IS NULL OR d.analysis_at != a.updated_at"
+        )
+        params = ()
+        if probe_text:
+            sql += " OR (d.has_text = 0 AND a.sha256 IS NOT NULL AND d.text_generation < ?)"
+            params = (generation,)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+            stale = self.conn.execute(
+                "SELECT d.id FROM search_docs d LEFT JOIN analyses a ON a.url = d.url WHERE a.url IS NULL"
+            ).fetchall()
+
+        updates = []
+        checked = []
+        for url, name, year, source, sha256, summary, themes, updated_at, doc_id, had_text, indexed_at in rows:
+            body = text_fn(sha256) if sha256 else None
+            if doc_id is not None and indexed_at == updated_at and body is None:
+                checked.append(doc_id)  # still no extracted text for it
+                continue
+            theme_list = json.loads(themes or "[]")
+            updates.append((doc_id, url, name, year, source, summary, theme_list, body, updated_at))
+        if not updates and not stale and not checked:
+            return 0
+
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE search_docs SET text_generation = ? WHERE id = ?", [(generation, i) for i in checked]
+            )
+            for (doc_id,) in stale:
+                conn.execute("DELETE FROM search_fts WHERE rowid = ?", (doc_id,))
+                conn.execute("DELETE FROM search_docs WHERE id = ?", (doc_id,))
+            for doc_id, url, name, year, source, summary, theme_list, body, updated_at in updates:
+                if doc_id is not None:
+                    conn.execute("DELETE FROM search_fts WHERE rowid = ?", (doc_id,))
+                    conn.execute("DELETE FROM search_docs WHERE id = ?", (doc_id,))
+                cur = conn.execute(
+                    "INSERT INTO search_docs(url, year, source, themes, has_text, analysis_at, text_generation) "
+                    "VALUES(?, ?, ?, ?, ?, ?, ?)",
+                    (url, year, source, json.dumps(theme_list, ensure_ascii=False), int(body is not None),
+                     updated_at, generation),
+                )
+                conn.execute(
+                    "INSERT INTO search_fts(rowid, name, summary, themes, body) VALUES(?, ?, ?, ?, ?)",
+                    (cur.lastrowid, name or "", summary or "", " ".join(theme_list), body or ""),
+                )
+        return len(updates) + len(stale)
+
+    def search(self, query: str, year=None, source=None, theme=None, limit: int = 20) -> list:
+        """
+        BM25-ranked full-text search (every query word must match, as a
+        prefix, ignoring case and accents), optionally filtered by year,
+        source and theme. An empty query lists the filtered documents,
+        newest first.
+        """
+        self._ensure_search()
+        where = []
+        params = []
+        if year is not None:
+            where.append("d.year = ?")
+            params.append(int(year))
+        if source:
+            where.append("fold(d.source) LIKE '%' || fold(?) || '%'")
+            params.append(source)
+        if theme:
+            where.append("EXISTS (SELECT 1 FROM json_each(d.themes) t WHERE fold(t.value) = fold(?))")
+            params.append(theme)
+
+        tokens = search_tokens(query or "")
+        if tokens:
+            match = " ".join(f'"{t}"*' for t in tokens)
+            weights = ", ".join(str(w) for w in self.SEARCH_WEIGHTS)
+            sql = (
+                f"SELECT d.url, f.name, d.year, d.source, d.themes, f.summary, bm25(search_fts, {weights}) AS rank, "
+                "snippet(search_fts, -1, '[', ']', '…', 16) "
+                "FROM search_fts f JOIN search_docs d ON d.id = f.rowid "
+                "WHERE search_fts MATCH ?"
+                + "".join(f" AND {w}" for w in where)
+                + " ORDER BY rank LIMIT ?"
+            )
+            params = [match] + params + [limit]
+        else:
+            sql = (
+                "SELECT d.url, f.name, d.year, d.source, d.themes, f.summary, 0, '' "
+                "FROM search_docs d JOIN search_fts f ON f.rowid = d.id"
+                + (" WHERE " + " AND ".join(where) if where else "")
+                + " ORDER BY d.year DESC, f.name LIMIT ?"
+            )
+            params = params + [limit]
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [
+            {
+                "url": url,
+                "name": name,
+                "year": year,
+                "source": source,
+                "themes": json.loads(themes or "[]"),
+                "summary": summary,
+                "score": -rank,
+                "snippet": snippet,
+            }
+            for url, name, year, source, themes, summary, rank, snippet in rows
+        ]
+
+    # --- JSON interop ---
+
+    def migrate_from_json(self):
+        """One-time import of the JSON state files written by older versions."""
+        if self.get_meta("json_migrated"):
+            return
+        known = _read_json_state(STATE_FILE, "state")
+        summaries = _read_json_state(SUMMARIES_FILE, "summaries")
+        fetch_meta = _read_json_state(FETCH_CACHE_FILE, "fetch cache")
+        self.save_documents(known)
+        self.save_analyses(summaries)
+        self.save_fetch_meta(fetch_meta)
+        self.set_meta("json_migrated", datetime.utcnow().isoformat() + "Z")
+        if known or summaries:
+            print(f"🗄️  Migrated {len(known)} known file(s) and {len(summaries)} summary(ies) to {self.path}")
+
+    def export_json(self) -> list:
+        """
+        Writes known_files.json and summaries.json from the database, in the
+        same format as before, skipping files whose contents are unchanged.
+        Returns the list of files written.
+        """
+        written = []
+        for filename, table in ((STATE_FILE, "documents"), (SUMMARIES_FILE, "analyses")):
+            items = {url: self._decode(table, url, data) for url, data in self._rows(table)}
+            if write_text_if_changed(Path(filename), json.dumps(items, indent=2, ensure_ascii=False)):
+                written.append(filename)
+        return written
+
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """Opens (and on first use migrates) the process-wide StateStore."""
+    global _state_store
+    with _state_store_lock:
+        if _state_store is None:
+            _state_store = StateStore(STATE_DB_FILE)
+            _state_store.migrate_from_json()
+        return _state_store
+
+
+def load_known_files():
+    return get_state_store().load_documents()
+
+
 def save_known_files(files_dict):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(files_dict, f, indent=2, ensure_ascii=False)
+    get_state_store().save_documents(files_dict)
 
 
 def load_summaries():
-    path = Path(SUMMARIES_FILE)
-    if not path.exists():
-        return {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError as e:
-        log_error(f"{SUMMARIES_FILE} is empty or invalid JSON: {e}. Resetting summaries.")
-        return {}
+    return get_state_store().load_analyses()
 
 
 def save_summaries(summaries_dict):
-    with open(SUMMARIES_FILE, "w", encoding="utf-8") as f:
-        json.dump(summaries_dict, f, indent=2, ensure_ascii=False)
+    get_state_store().save_analyses(summaries_dict)
+    try:
+        update_search_index()
+    except sqlite3.Error as e:
+        log_error(f"Could not update the search index: {e}", stage="store")
+
+
+def update_search_index() -> int:
+    """Incrementally syncs the full-text search index with the stored summaries."""
+    return get_state_store().update_search_index(cached_document_text)
+
+
+def search_decrees(query: str, year: int | None = None, source: str | None = None,
+                   theme: str | None = None, limit: int = 20) -> list:
+    """
+    Searches decree names, summaries, themes and (when cached) extracted PDF
+    text. Returns up to `limit` dicts (url, name, year, source, themes,
+    summary, score, snippet), best match first.
+    """
+    # Only new or changed summaries: looking for newly extracted text is left
+    # to save_summaries, so a search does not probe the text cache
+    get_state_store().update_search_index(cached_document_text, probe_text=False)
+    return get_state_store().search(query, year=year, source=source, theme=theme, limit=limit)
+
+
+def load_fetch_cache():
+    """ETag / Last-Modified / body hash per index URL, used for conditional GETs."""
+    return get_state_store().load_fetch_meta()
+
+
+def save_fetch_cache(cache_dict):
+    get_state_store().save_fetch_meta(cache_dict)
+
+
+def load_failed_files() -> dict:
+    """{url: (file_info, attempts)} of decrees whose last attempts failed."""
+    return get_state_store().load_failures()
+
+
+def record_failed_files(files: list, recovered: list):
+    """
+    Counts a failed attempt for each of `files` (file_info dicts) and forgets
+    the earlier failures of the `recovered` URLs.
+    """
+    store = get_state_store()
+    store.clear_failures(recovered)
+    store.record_failures(files)
+    for url, (f, attempts) in store.load_failures().items():
+        if attempts >= FILE_MAX_ATTEMPTS and any(g["url"] == url for g in files):
+            log_error(f"Giving up on {f.get('name') or url} after {attempts} failed attempts", stage="retry", url=url)
+
+
+def checkpoint_file(file_info: dict, entry: dict):
+    """
+    Records one finished file in the journal right away (its own committed
+    transaction), so the work survives a crash later in the run.
+    """
+    get_state_store().append_journal(file_info["url"], file_info, entry)
+
+
+def replay_journal(known: dict, summaries: dict) -> list:
+    """
+    Applies files checkpointed by an interrupted run to known/summaries.
+    Returns the replayed URLs (already-present URLs are left untouched).
+    """
+    replayed = []
+    for url, document, entry in get_state_store().read_journal():
+        if url in summaries:
+            continue
+        known[url] = document
+        summaries[url] = entry
+        replayed.append(url)
+    return replayed
+
+
+def has_checkpoints() -> bool:
+    """Whether an interrupted run left files in the journal."""
+    return get_state_store().journal_size() > 0
+
+
+def compact_journal():
+    """Drops the journal once its entries are saved in the state tables."""
+    get_state_store().clear_journal()
+
+
+def export_state_json():
+    """Refreshes the committed JSON artifacts (known_files.json, summaries.json)."""
+    for filename in get_state_store().export_json():
+        print(f"🗄️  Exported {filename}")
 
 
 # ================== DOWNLOAD ==================
 
-def download_file(file_info):
+def sha256_file(path: Path) -> str:
+    """SHA-256 of a file on disk, read in chunks."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def download_path(file_info: dict) -> Path:
+    """
+    Local path of a decree PDF: its name plus a hash of its URL, since the
+    same file name is re-published under different /getattachment/<guid>/ URLs.
+    """
+    name = Path(file_info["name"].replace(".aspx", ".pdf"))
+    url_hash = hashlib.sha256(file_info["url"].encode("utf-8")).hexdigest()[:8]
+    return DOWNLOAD_DIR / f"{name.stem}-{url_hash}{name.suffix}"
+
+
+def download_file(file_info, force: bool = False):
     """
     Downloads the file. The .aspx file served is actually a PDF.
+
+    The body is streamed in chunks to a .part file (hashed on the fly) and
+    renamed into place once complete, so memory use does not depend on the
+    PDF size. An interrupted transfer leaves the .part file behind (plus the
+    response's ETag or Last-Modified in .part.validator) and is resumed next
+    time with an HTTP Range request conditional on it (If-Range), so a PDF
+    that changed in between is downloaded whole instead of spliced.
+
+    The SHA-256 and source URL are stored next to the PDF (<name>.pdf.sha256)
+    and the hash is set on file_info["sha256"]; if a local copy from the same
+    URL already matches it, nothing is downloaded (unless force). The
+    response's ETag / Last-Modified and the file size are kept in file_info
+    too, for revalidate_attachments.
     """
     DOWNLOAD_DIR.mkdir(exist_ok=True)
 
     url = file_info["url"]
-    name = file_info["name"].replace(".aspx", ".pdf")
-    dest = DOWNLOAD_DIR / name
+    dest = download_path(file_info)
+    hash_path = dest.with_name(dest.name + ".sha256")
+    part_path = dest.with_name(dest.name + ".part")
+    validator_path = dest.with_name(dest.name + ".part.validator")
+
+    if dest.exists() and hash_path.exists() and not force:
+        expected, _, source_url = hash_path.read_text(encoding="utf-8").strip().partition(" ")
+        if source_url == url and sha256_file(dest) == expected:
+            print(f"   ✓ Already downloaded, skipping: {dest}")
+            get_metrics().inc("downloads", result="local_copy")
+            file_info["sha256"] = expected
+            return dest
+
+    hasher = hashlib.sha256()
+    offset = 0
+    validator = validator_path.read_text(encoding="utf-8").strip() if validator_path.exists() else ""
+    if part_path.exists() and validator:
+        offset = part_path.stat().st_size
+        with open(part_path, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+
+    if offset:
+        print(f"⬇️  Resuming {url} → {dest} from byte {offset}")
+    else:
+        print(f"⬇️  Downloading {url} → {dest}")
 
-    print(f"⬇️  Downloading {url} → {dest}")
-
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        )
-    }
+    # identity encoding so byte offsets in Range match what we wrote to disk
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        # The server sends the whole file (200) if it changed since the partial
+        headers["If-Range"] = validator
 
+    received = 0
     try:
-        resp = requests.get(url, headers=headers, timeout=60)
-        resp.raise_for_status()
+        with get_metrics().timer("download"), \
+                get_http_client().get(url, headers=headers, timeout=60, stream=True) as resp:
+            if offset and resp.status_code == 416:
+                # Our partial file is not a prefix the server recognizes; start over
+                part_path.unlink()
+                return download_file(file_info, force)
+            resp.raise_for_status()
+            for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+                if resp.headers.get(header):
+                    file_info[key] = resp.headers[header]
+
+            if offset and resp.status_code != 206:
+                # The file changed, or the server ignored the Range header:
+                # it is sending the whole file
+                print("   ⚠️  Cannot resume, downloading from scratch")
+                hasher = hashlib.sha256()
+                mode = "wb"
+            else:
+                mode = "ab" if offset else "wb"
+            if mode == "wb":
+                new_validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified") or ""
+                if new_validator.startswith("W/"):
+                    new_validator = ""  # weak ETags cannot be used in If-Range
+                validator_path.write_text(new_validator, encoding="utf-8")
+
+            with open(part_path, mode) as f:
+                for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    received += len(chunk)
     except Exception as e:
-        log_error(f"Error downloading {url}: {e}")
+        log_error(f"Error downloading {url}: {e}", stage="download", url=url)
         raise
-
-    with open(dest, "wb") as f:
-        f.write(resp.content)
-
+    finally:
+        get_metrics().inc("http_bytes", received, kind="pdf")
+
+    digest = hasher.hexdigest()
+    os.replace(part_path, dest)
+    validator_path.unlink(missing_ok=True)
+    tmp_hash_path = hash_path.with_name(hash_path.name + ".tmp")
+    tmp_hash_path.write_text(f"{digest} {url}\n", encoding="utf-8")
+    os.replace(tmp_hash_path, hash_path)
+    file_info["sha256"] = digest
+    file_info["size"] = dest.stat().st_size
+
+    get_metrics().inc("downloads", result="resumed" if offset and mode == "ab" else "downloaded")
     print("   ✓ Downloaded")
     return dest
 
 
+# ================== REVALIDATION ==================
+
+REVALIDATION_CHECKED_KEY = "revalidation_checked"  # meta: {url: last check time}
+REVALIDATION_LAST_PASS_KEY = "revalidation_last_pass"  # meta: time of the last pass
+
+
+def revalidation_due(now: float | None = None) -> bool:
+    if REVALIDATE_BATCH <= 0:
+        return False
+    now = time.time() if now is None else now
+    last_pass = float(get_state_store().get_meta(REVALIDATION_LAST_PASS_KEY) or 0)
+    return now - last_pass >= REVALIDATE_INTERVAL
+
+
+def check_attachment(document: dict) -> tuple[str, dict]:
+    """
+    Asks the server whether a downloaded attachment changed, without
+    downloading it: a HEAD request (a conditional GET whose body is never
+    read if HEAD is not allowed), conditional on the stored ETag /
+    Last-Modified, and a comparison of the validators it returns with the
+    stored ones. Returns (result, validators): result is "unchanged",
+    "changed", "unknown" (nothing to compare, e.g. files downloaded before
+    validators were kept) or "gone", and validators holds the etag,
+    last_modified and size the server reported (those it sent).
+    """
+    url = document["url"]
+    headers = {"Accept-Encoding": "identity"}
+    if document.get("etag"):
+        headers["If-None-Match"] = document["etag"]
+    if document.get("last_modified"):
+        headers["If-Modified-Since"] = document["last_modified"]
+
+    client = get_http_client()
+    resp = client.head(url, headers=headers, timeout=30)
+    if resp.status_code in (405, 501):
+        with client.get(url, headers=headers, timeout=30, stream=True) as resp:
+            pass
+    if resp.status_code == 304:
+        return "unchanged", {}
+    if resp.status_code in (404, 410):
+        return "gone", {}
+    resp.raise_for_status()
+
+    length = resp.headers.get("Content-Length", "")
+    current = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "size": int(length) if length.isdigit() else None,
+    }
+    current = {k: value for k, value in current.items() if value is not None}
+    compared = [k for k in current if document.get(k) is not None]
+    if not compared:
+        return "unknown", current
+    return ("changed" if any(current[k] != document[k] for k in compared) else "unchanged"), current
+
+
+def revalidate_attachments(known: dict, summaries: dict, limit: int = REVALIDATE_BATCH) -> list:
+    """
+    Checks the `limit` summarized attachments checked least recently (see
+    check_attachment). Those that changed are downloaded again and hashed:
+    if only their validators changed, `known` is updated in place; if the
+    content changed too, they are returned (as downloaded file_info dicts)
+    to be analyzed again. Those that could not be compared are not
+    downloaded: the validators the server reported are stored in `known` as
+    the baseline for the next pass.
+    """
+    store = get_state_store()
+    checked = json.loads(store.get_meta(REVALIDATION_CHECKED_KEY) or "{}")
+    urls = sorted((url for url in summaries if url in known), key=lambda url: checked.get(url, 0))[:limit]
+    print(f"🔁 Revalidating {len(urls)} summarized attachment(s) ...")
+
+    changed = []
+    for url in urls:
+        document = known[url]
+        try:
+            result, validators = check_attachment(document)
+            if result == "unknown":
+                known[url] = dict(document, **validators)
+            elif result == "changed":
+                fresh = dict(document)
+                download_file(fresh, force=True)
+                previous = summaries[url].get("sha256") or document.get("sha256")
+                if previous and fresh["sha256"] != previous:
+                    result = "content_changed"
+                    print(f"   ✏️  {document['name']}: the PDF was replaced upstream, analyzing it again")
+                    changed.append(fresh)
+                else:
+                    known[url] = fresh
+            elif result == "gone":
+                print(f"   ⚠️  {document['name']}: no longer available upstream ({url})")
+        except Exception as e:
+            log_error(f"Could not revalidate {url}: {e}", stage="revalidate", url=url)
+            result = "error"
+        get_metrics().inc("revalidations", result=result)
+        checked[url] = time.time()
+
+    checked = {url: t for url, t in checked.items() if url in summaries}
+    store.set_meta(REVALIDATION_CHECKED_KEY, json.dumps(checked))
+    store.set_meta(REVALIDATION_LAST_PASS_KEY, str(time.time()))
+    return changed
+
+
 # ================== PDF → TEXT ==================
 
-def extract_text_from_pdf(filepath: Path) -> str:
+def _join_pages(pages: list) -> str:
+    return "\n\n".join(p for p in pages if p is not None).strip()
+
+
+def _pages_length(pages: list) -> int:
     """
-    Extracts text from a PDF using pypdf.
-    Returns a single string with all pages concatenated.
+    Length of the pages joined as in _join_pages, before stripping: the
+    measure the max_chars budget is checked against. Extraction keeps it as a
+    running count, so checking the budget after each page stays linear.
+    """
+    return sum(len(p) + 2 for p in pages if p is not None) - 2
+
+
+_extractor_version = None
+
+
+def extractor_version() -> str:
+    """pypdf version + EXTRACTOR_REVISION, read without importing pypdf."""
+    global _extractor_version
+    if _extractor_version is None:
+        from importlib.metadata import PackageNotFoundError, version as package_version
+
+        try:
+            _extractor_version = f"pypdf-{package_version('pypdf')}/{EXTRACTOR_REVISION}"
+        except PackageNotFoundError:
+            from pypdf import __version__
+
+            _extractor_version = f"pypdf-{__version__}/{EXTRACTOR_REVISION}"
+    return _extractor_version
+
+
+def text_cache_key(sha256: str) -> str:
+    return hashlib.sha256(f"{extractor_version()}:{sha256}".encode("utf-8")).hexdigest()
+
+
+TEXT_GENERATION_KEY = "text_generation"  # meta: bumped whenever PDF text is cached
+
+
+def note_text_cached():
     """
+    Bumps TEXT_GENERATION_KEY after PDF text was added to the text cache, so
+    the next search index update looks for it (see update_search_index).
+    """
+    store = get_state_store()
+    with store.transaction() as conn:
+        conn.execute(
+            "INSERT INTO meta(key, value) VALUES(?, '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+            (TEXT_GENERATION_KEY,),
+        )
+
+
+def cached_document_text(sha256: str) -> str | None:
+    """Extracted text of a PDF if it is in the text cache (never parses the PDF)."""
+    key = text_cache_key(sha256)
+    if key not in get_text_cache():
+        return None
+    cached = get_text_cache().get(key)
+    return _join_pages(cached["pages"]) if cached is not None else None
+
+
+def _extract_page_range(filepath: str, start: int, stop: int) -> list:
+    """Worker for parallel extraction: text of pages [start, stop) of one PDF."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(filepath)
+    pages = []
+    for n in range(start, stop):
+        try:
+            pages.append(reader.pages[n].extract_text() or "")
+        except Exception as e:
+            log_error(f"Could not read page {n + 1} from {filepath}: {e}", stage="extract", level="warning")
+            pages.append(None)
+    return pages
+
+
+def _extract_pages_parallel(filepath: Path, num_pages: int, max_chars: int | None) -> tuple[list, bool]:
+    """
+    Extracts pages in PDF_PAGES_PER_TASK-sized ranges on a process pool.
+    Ranges are submitted in order a few at a time, so with a budget we stop
+    scheduling work as soon as the pages received so far exceed it.
+    """
+    ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, num_pages))
+        for start in range(0, num_pages, PDF_PAGES_PER_TASK)
+    ]
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    pages = []
+    chars = -2  # _pages_length(pages); the first page adds no separator
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=PDF_PARALLEL_WORKERS, mp_context=mp_context) as pool:
+        window = []
+        next_range = 0
+        while next_range < len(ranges) or window:
+            while next_range < len(ranges) and len(window) < PDF_PARALLEL_WORKERS:
+                start, stop = ranges[next_range]
+                window.append(pool.submit(_extract_page_range, str(filepath), start, stop))
+                next_range += 1
+            received = window.pop(0).result()
+            pages.extend(received)
+            chars += sum(len(p) + 2 for p in received if p is not None)
+            if max_chars is not None and chars > max_chars:
+                for fut in window:
+                    fut.cancel()
+                return pages, len(pages) >= num_pages
+    return pages, True
+
+
+def extract_pages_from_pdf(
+    filepath: Path,
+    sha256: str | None = None,
+    max_chars: int | None = None,
+    parallel: bool | None = None,
+) -> list:
+    """
+    Extracts the text of each page of a PDF using pypdf.
+    Pages that could not be read are returned as None.
+
+    With max_chars, pages are read in order only until the joined text is
+    longer than max_chars, so long annexes are never parsed when we are
+    going to truncate anyway. With parallel (default PDF_PARALLEL_EXTRACTION),
+    PDFs of at least PDF_PARALLEL_MIN_PAGES pages are split across a process pool.
+
+    Results are cached on disk (compressed) by PDF content hash and
+    extractor_version(), so a PDF is only parsed once. A partial extraction is
+    reused only if it already covers the requested budget.
+    """
+    key = text_cache_key(sha256 or sha256_file(filepath))
+    cached = get_text_cache().get(key)
+    if cached is not None and (
+        cached.get("complete", True)
+        or (max_chars is not None and _pages_length(cached["pages"]) > max_chars)
+    ):
+        print(f"📝 Using cached text for {filepath.name}")
+        get_metrics().inc("text_cache", result="hit")
+        return cached["pages"]
+
+    metrics = get_metrics()
+    metrics.inc("text_cache", result="miss")
+    with metrics.timer("pdf_extract"):
+        pages, complete = _extract_pages_uncached(filepath, max_chars, parallel)
+    if metrics.enabled:
+        metrics.inc("pdf_pages", sum(p is not None for p in pages))
+        metrics.inc("pdf_unreadable_pages", sum(p is None for p in pages))
+        metrics.inc("pdf_chars", sum(len(p) for p in pages if p))
+    get_text_cache().put(key, {"pages": pages, "complete": complete})
+    return pages
+
+
+def _extract_pages_uncached(filepath: Path, max_chars: int | None, parallel: bool | None) -> tuple[list, bool]:
     print(f"📝 Extracting text from {filepath.name} ...")
+    from pypdf import PdfReader
+
     try:
         reader = PdfReader(str(filepath))
+        num_pages = len(reader.pages)
     except Exception as e:
-        log_error(f"Error opening PDF {filepath}: {e}")
+        log_error(f"Error opening PDF {filepath}: {e}", stage="extract")
         raise
 
-    texts = []
+    if parallel is None:
+        parallel = PDF_PARALLEL_EXTRACTION
 
-    for page in reader.pages:
-        try:
-            texts.append(page.extract_text() or "")
-        except Exception as e:
-            log_error(f"Could not read a page from {filepath}: {e}")
-            print(f"   ⚠️  Warning: could not read a page from {filepath}: {e}")
+    if parallel and num_pages >= PDF_PARALLEL_MIN_PAGES:
+        pages, complete = _extract_pages_parallel(filepath, num_pages, max_chars)
+    else:
+        pages = []
+        chars = -2  # _pages_length(pages); the first page adds no separator
+        complete = True
+        for n, page in enumerate(reader.pages):
+            try:
+                pages.append(page.extract_text() or "")
+                chars += len(pages[-1]) + 2
+            except Exception as e:
+                log_error(f"Could not read a page from {filepath}: {e}", stage="extract", level="warning")
+                print(f"   ⚠️  Warning: could not read a page from {filepath}: {e}")
+                pages.append(None)
+            if max_chars is not None and n + 1 < num_pages and chars > max_chars:
+                complete = False
+                break
+
+    if not complete:
+        print(f"   ✓ Read {len(pages)}/{num_pages} pages (enough text for the summary)")
+    return pages, complete
+
+
+def extract_text_from_pdf(filepath: Path, sha256: str | None = None, max_chars: int | None = None) -> str:
+    """
+    Extracts text from a PDF using pypdf.
+    Returns a single string with all pages concatenated (or, with max_chars,
+    at least enough leading pages to exceed max_chars).
+    """
+    return _join_pages(extract_pages_from_pdf(filepath, sha256, max_chars))
+
+
+def _pipeline_extract(filepath: Path, sha256: str | None, max_chars: int | None,
+                      collect_metrics: bool) -> tuple[str, dict | None]:
+    """
+    extract_text_from_pdf for the pipeline's process pool. Returns the text
+    and, with collect_metrics, a snapshot of the metrics recorded in the
+    worker, for the parent to merge.
+    """
+    metrics = start_metrics(collect_metrics)
+    return extract_text_from_pdf(filepath, sha256, max_chars), metrics.snapshot()
+
+
+# ================== OPENAI RATE LIMITING ==================
 
-    full_text = "\n\n".join(texts)
-    return full_text.strip()
+class TokenBucketLimiter:
+    """
+    Client-side limiter for the OpenAI API: one token bucket for requests per
+    minute and one for tokens per minute, both refilled continuously and
+    shared by every thread. Callers reserve an estimated token count up front
+    and settle the difference once the real usage is known. After a 429 the
+    limiter is paused so all threads back off together. tokens_used adds up
+    the real usage settled so far.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = max(1, rpm)
+        self.tpm = max(1, tpm)
+        self._requests = float(self.rpm)
+        self._tokens = float(self.tpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.tokens_used = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int):
+        # A request larger than the whole bucket may still run once it is full
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    self._paused_until - now,
+                    (1 - self._requests) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm,
+                    0.01,
+                )
+            time.sleep(wait)
+
+    def settle(self, reserved: int, actual: int):
+        with self._lock:
+            self._tokens = min(self.tpm, self._tokens + reserved - actual)
+            self.tokens_used += actual
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_openai_limiter = None
+_openai_limiter_lock = threading.Lock()
+
+
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """
+    The process-wide OpenAI client, created (and the openai package
+    imported) on first use. None when OPENAI_API_KEY is not set.
+    """
+    global _openai_client
+    if not OPENAI_API_KEY:
+        return None
+    with _openai_client_lock:
+        if _openai_client is None:
+            from openai import OpenAI
+
+            # Retries are handled by chat_completion(), together with rate limiting
+            _openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        return _openai_client
+
+
+def get_openai_limiter() -> TokenBucketLimiter:
+    global _openai_limiter
+    with _openai_limiter_lock:
+        if _openai_limiter is None:
+            _openai_limiter = TokenBucketLimiter(OPENAI_RPM, OPENAI_TPM)
+        return _openai_limiter
+
+
+def _openai_retry_after(error) -> float | None:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def chat_completion(messages: list, response_format: dict | None = None):
+    """
+    client.chat.completions.create for ANALYSIS_MODEL, throttled to
+    OPENAI_RPM / OPENAI_TPM and retried on 429, 5xx and connection errors
+    with jittered exponential backoff (or the server's Retry-After).
+    """
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    client = get_openai_client()
+    limiter = get_openai_limiter()
+    estimate = sum(count_tokens(m["content"]) for m in messages) + OPENAI_COMPLETION_TOKENS_ESTIMATE
+    kwargs = {"model": ANALYSIS_MODEL, "messages": messages}
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+
+    metrics = get_metrics()
+    attempt = 0
+    while True:
+        with metrics.timer("openai_limiter_wait"):
+            limiter.acquire(estimate)
+        start = time.perf_counter()
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except (RateLimitError, InternalServerError, APIConnectionError) as e:
+            metrics.inc("openai_errors", error=type(e).__name__)
+            # The request was not served: give the reserved tokens back
+            limiter.settle(estimate, 0)
+            if attempt >= OPENAI_MAX_RETRIES:
+                raise
+            delay = _openai_retry_after(e)
+            if delay is None:
+                delay = random.uniform(0, min(60.0, 2.0 ** attempt))
+            if isinstance(e, RateLimitError):
+                limiter.pause(delay)
+            attempt += 1
+            metrics.inc("openai_retries")
+            print(f"   ↻ OpenAI retry {attempt}/{OPENAI_MAX_RETRIES} in {delay:.1f}s ({type(e).__name__})")
+            time.sleep(delay)
+            continue
+
+        metrics.observe("openai_request", time.perf_counter() - start)
+        metrics.inc("openai_requests")
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            metrics.inc("openai_tokens", usage.prompt_tokens or 0, type="prompt")
+            metrics.inc("openai_tokens", usage.completion_tokens or 0, type="completion")
+            if usage.total_tokens is not None:
+                limiter.settle(estimate, usage.total_tokens)
+        return response
 
 
 # ================== CHATGPT ANALYSIS ==================
 
+# Structured-output schemas: the API guarantees the reply parses as this JSON
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "decree_analysis",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "summary": {"type": "string"},
+                "themes": {"type": "array", "items": {"type": "string"}},
+                "source": {"type": "string"},
+            },
+            "required": ["summary", "themes", "source"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+CHUNK_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "decree_part_summary",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "summary": {"type": "string"},
+                "themes": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["summary", "themes"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+# Summaries stored when a document could not actually be analyzed (and, for
+# SUMMARY_INVALID_REPLY, by earlier versions). They are never reused for other
+# files with the same content (see build_content_index)
+SUMMARY_NO_API_KEY = "Resumen omitido (no hay OPENAI_API_KEY configurada)."
+SUMMARY_EXTRACTION_FAILED = "No se pudo extraer el texto del PDF para resumirlo."
+SUMMARY_NO_TEXT = "El PDF no contiene texto legible o está escaneado como imagen."
+SUMMARY_INVALID_REPLY = "No se pudo generar el resumen (respuesta inválida de la API)."
+SUMMARY_EMPTY = "Resumen no disponible."
+PLACEHOLDER_SUMMARIES = frozenset({
+    SUMMARY_NO_API_KEY, SUMMARY_EXTRACTION_FAILED, SUMMARY_NO_TEXT, SUMMARY_INVALID_REPLY, SUMMARY_EMPTY,
+})
+
+
+def is_placeholder_analysis(analysis: dict) -> bool:
+    return analysis.get("summary") in PLACEHOLDER_SUMMARIES
+
+
+def _analysis_fallback(summary: str, source_hint: str | None) -> dict:
+    return {
+        "summary": summary,
+        "themes": [],
+        "source": source_hint or "Desconocida",
+    }
+
+
 def analyze_file(filepath: Path, title: str, year: int | None, source_hint: str | None) -> dict:
     """
     Extracts text from the PDF and asks ChatGPT for:
@@ -229,31 +2365,22 @@ def analyze_file(filepath: Path, title: str, year: int | None, source_hint: str
       - source (institution)
     Returns: {"summary": str, "themes": [str, ...], "source": str}
     """
-    if client is None:
-        return {
-            "summary": "Resumen omitido (no hay OPENAI_API_KEY configurada).",
-            "themes": [],
-            "source": source_hint or "Desconocida",
-        }
+    if get_openai_client() is None:
+        return _analysis_fallback(SUMMARY_NO_API_KEY, source_hint)
 
     try:
-        text = extract_text_from_pdf(filepath)
+        text = extract_text_from_pdf(filepath, max_chars=MAX_DOCUMENT_CHARS)
     except Exception as e:
-        log_error(f"Text extraction failed for {filepath}: {e}")
-        return {
-            "summary": "No se pudo extraer el texto del PDF para resumirlo.",
-            "themes": [],
-            "source": source_hint or "Desconocida",
-        }
+        log_error(f"Text extraction failed for {filepath}: {e}", stage="extract")
+        return _analysis_fallback(SUMMARY_EXTRACTION_FAILED, source_hint)
+    note_text_cached()
+
+    return analyze_text(text, filepath, title, year, source_hint)
 
-    if not text:
-        return {
-            "summary": "El PDF no contiene texto legible o está escaneado como imagen.",
-            "themes": [],
-            "source": source_hint or "Desconocida",
-        }
 
-    max_chars = 12000  # to keep the prompt manageable
+def build_analysis_messages(text: str, title: str, year: int | None, source_hint: str | None) -> list:
+    """Chat messages asking ChatGPT for {summary, themes, source} of a document."""
+    max_chars = MAX_PROMPT_CHARS  # to keep the prompt manageable
     if len(text) > max_chars:
         text_to_summarize = text[:max_chars]
         truncated_note = " (Texto truncado para el resumen por límite de longitud.)"
@@ -306,108 +2433,562 @@ Texto del documento completo:
 {text_to_summarize}
 """
 
-    print(f"🤖 Solicitando análisis a ChatGPT para {title} ...")
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "Respondes SIEMPRE con JSON válido. No incluyas nada de texto fuera del JSON."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-        )
-        content = response.choices[0].message.content.strip()
-    except Exception as e:
-        log_error(f"OpenAI API error for {filepath}: {e}")
-        return {
-            "summary": "No se pudo generar el resumen (error de la API).",
-            "themes": [],
-            "source": source_info,
-        }
-
-    # Try to parse JSON; fallback if something goes wrong
+    return [
+        {
+            "role": "system",
+            "content": (
+                "Respondes SIEMPRE con JSON válido. No incluyas nada de texto fuera del JSON."
+            ),
+        },
+        {
+            "role": "user",
+            "content": prompt,
+        },
+    ]
+
+
+def parse_analysis_content(content: str, source_info: str, filepath) -> tuple[dict, bool]:
+    """
+    Parses the model's structured JSON answer into {summary, themes, source}.
+    Returns (analysis, ok); if the answer is not valid JSON (e.g. a refusal or
+    a cut-off reply) a placeholder summary is returned and ok is False.
+    """
     try:
-        # In case the model adds some text, try to extract the first {...} block
-        start = content.index("{")
-        end = content.rindex("}") + 1
-        json_str = content[start:end]
-        data = json.loads(json_str)
+        data = json.loads(content)
         summary = str(data.get("summary", "")).strip()
         themes_raw = data.get("themes") or []
         source = str(data.get("source", source_info)).strip()
         themes = [str(t).strip() for t in themes_raw if str(t).strip()]
         return {
-            "summary": summary or "Resumen no disponible.",
+            "summary": summary or SUMMARY_EMPTY,
             "themes": themes,
             "source": source or source_info,
-        }
-    except Exception as e:
+        }, True
+    except (ValueError, AttributeError) as e:
         log_error(
             f"Could not parse JSON from OpenAI for {filepath}: {e}. "
-            f"Content (first 300 chars): {content[:300]}"
+            f"Content (first 300 chars): {content[:300]}",
+            stage="analyze",
         )
         return {
-            "summary": content,
+            "summary": SUMMARY_INVALID_REPLY,
             "themes": [],
             "source": source_info,
-        }
+        }, False
+
+
+def analyze_text(
+    text: str,
+    filepath: Path,
+    title: str,
+    year: int | None,
+    source_hint: str | None,
+    document_hash: str | None = None,
+    refresh: bool | None = None,
+) -> dict:
+    """
+    Second half of analyze_file: sends already extracted text to ChatGPT.
+    Split out so the pipeline can run extraction and API calls on separate pools.
 
+    Documents longer than SINGLE_PASS_TOKENS are analyzed map-reduce style
+    (see summarize_long_document) instead of being truncated.
 
-# ================== REPORTS ==================
+    API errors that persist after chat_completion's retries, and replies that
+    are not a valid analysis (refusals, cut-off JSON), are raised, so the
+    file is not stored with a placeholder summary.
 
-def generate_markdown_report(summaries: dict, output_path: Path):
+    Successful analyses are cached by model, prompt and document hash (the
+    PDF's SHA-256 if given, else a hash of the text); refresh=True (default
+    LLM_CACHE_REFRESH) skips the cache lookup and overwrites the entry.
     """
-    Generates a simple Markdown report listing each decree and its summary.
+    if not text:
+        return _analysis_fallback(SUMMARY_NO_TEXT, source_hint)
+
+    source_info = source_hint or "Entidad emisora desconocida"
+    long_document = count_tokens(text) > SINGLE_PASS_TOKENS
+    messages = build_analysis_messages(text, title, year, source_hint)
+    if long_document:
+        # Key long documents on the chunking setup too, since it shapes the result
+        messages = messages + [{
+            "role": "system",
+            "content": f"map-reduce/{MAP_CHUNK_TOKENS}/{MAX_DOCUMENT_TOKENS}",
+        }]
+
+    if refresh is None:
+        refresh = LLM_CACHE_REFRESH
+    document_hash = document_hash or hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cache_key = llm_cache_key(ANALYSIS_MODEL, messages, document_hash)
+    if not refresh:
+        cached = get_llm_cache().get(cache_key)
+        if cached is not None:
+            print(f"🤖 Using cached analysis for {title}")
+            get_metrics().inc("llm_cache", result="hit")
+            return cached
+    get_metrics().inc("llm_cache", result="miss")
+
+    print(f"🤖 Solicitando análisis a ChatGPT para {title} ...")
+
+    try:
+        with get_metrics().timer("analyze", mode="map_reduce" if long_document else "single"):
+            if long_document:
+                content = summarize_long_document(text, filepath, title, year, source_hint)
+            else:
+                content = _request_analysis(messages)
+    except Exception as e:
+        # Raised rather than stored as a placeholder, so the file stays pending
+        # and is retried on the next run
+        log_error(f"OpenAI API error for {filepath}: {e}", stage="analyze")
+        raise
+
+    analysis, ok = parse_analysis_content(content, source_info, filepath)
+    if not ok:
+        # A refusal or a cut-off reply: like an API error, the file stays
+        # pending and is retried (up to FILE_MAX_ATTEMPTS) instead of keeping
+        # the placeholder as its summary
+        raise ValueError(f"Invalid analysis reply for {title}")
+    get_llm_cache().put(cache_key, analysis)
+    return analysis
+
+
+# ================== LONG DOCUMENTS ==================
+
+_tokenizer = None
+
+# Lines that start a new structural unit of a decree
+DECREE_HEADING_RE = re.compile(
+    r"^[ \t]*(?:ART[IÍ]CULO|CAP[IÍ]TULO|T[IÍ]TULO|SECCI[OÓ]N|PAR[AÁ]GRAFO)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def count_tokens(text: str) -> int:
     """
-    lines = []
-    lines.append("# Decretos – Resumen automático\n")
-    lines.append(f"_Total de decretos resumidos: {len(summaries)}_\n")
-    lines.append("---\n")
+    Token count with tiktoken, otherwise (not installed, or its encoding
+    could not be downloaded) a chars/token estimate. The encoding is
+    downloaded on first use and kept under CACHE_DIR unless
+    TIKTOKEN_CACHE_DIR says otherwise.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(CACHE_DIR / "tiktoken"))
+        try:
+            import tiktoken  # exact token counts for the map-reduce chunker
 
-    # Sort by year then filename
-    def sort_key(item):
-        url, info = item
-        return (info.get("year") or 9999, info["name"])
+            _tokenizer = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _tokenizer = False
+        except Exception as e:
+            log_error(
+                f"Could not load the o200k_base tiktoken encoding, estimating token counts: {e}",
+                stage="analyze", level="warning",
+            )
+            _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text, disallowed_special=()))
+    # Spanish legal text averages roughly 3.5-4 characters per token
+    return int(len(text) / 3.5) + 1
+
+
+def _split_oversized(section: str, max_tokens: int) -> list:
+    """Splits a section that alone exceeds max_tokens by paragraphs, then by length."""
+    pieces = []
+    current = ""
+    for para in re.split(r"\n\s*\n", section):
+        candidate = f"{current}\n\n{para}" if current else para
+        if count_tokens(candidate) <= max_tokens:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        if count_tokens(para) <= max_tokens:
+            current = para
+        else:
+            # A single huge paragraph: cut it into fixed windows
+            step = max(1, int(len(para) * max_tokens / count_tokens(para)))
+            pieces.extend(para[i:i + step] for i in range(0, len(para), step))
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
 
-    for url, info in sorted(summaries.items(), key=sort_key):
-        name = info.get("name", "Sin nombre")
-        summary = info.get("summary", "Sin resumen disponible.")
-        local_path = info.get("local_path", "")
-        year = info.get("year")
-        themes = info.get("themes") or []
-        source = info.get("source") or "Desconocida"
-
-        lines.append(f"## {name}\n")
-        if year:
-            lines.append(f"- Año: **{year}**")
-        lines.append(f"- Fuente: **{source}**")
-        lines.append(f"- URL original: {url}")
-        if local_path:
-            lines.append(f"- Archivo local: `{local_path}`")
-        if themes:
-            lines.append(f"- Temas: {', '.join(themes)}")
-        lines.append("\n**Resumen:**\n")
-        lines.append(summary.strip())
-        lines.append("\n---\n")
 
-    output_path.write_text("\n".join(lines), encoding="utf-8")
-    print(f"📄 Reporte Markdown generado en: {output_path}")
+def split_decree_text(text: str, max_tokens: int) -> list:
+    """
+    Splits a decree into chunks of at most max_tokens, cutting at
+    ARTÍCULO / CAPÍTULO / TÍTULO headings so articles are kept together
+    whenever they fit.
+    """
+    starts = [m.start() for m in DECREE_HEADING_RE.finditer(text)]
+    bounds = [0] + [p for p in starts if p > 0] + [len(text)]
+    sections = [text[a:b].strip() for a, b in zip(bounds, bounds[1:])]
+
+    chunks = []
+    current = ""
+    for section in sections:
+        if not section:
+            continue
+        candidate = f"{current}\n\n{section}" if current else section
+        if count_tokens(candidate) <= max_tokens:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        if count_tokens(section) <= max_tokens:
+            current = section
+        else:
+            chunks.extend(_split_oversized(section, max_tokens))
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
 
+def _build_chunk_messages(chunk: str, index: int, total: int, title: str) -> list:
+    prompt = f"""
+Eres un analista de derecho regulatorio. A continuación tienes la parte {index} de {total}
+del documento normativo "{title}".
+
+Resume esta parte en un JSON válido con la estructura:
 
-def generate_html_report(summaries: dict, output_path: Path):
+{{
+  "summary": "resumen (máx. 120 palabras) de propósito, obligaciones, requisitos y cambios regulatorios de esta parte",
+  "themes": ["temas o áreas regulatorias clave de esta parte"]
+}}
+
+Texto de la parte {index}/{total}:
+{chunk}
+"""
+    return [
+        {"role": "system", "content": "Respondes SIEMPRE con JSON válido. No incluyas nada de texto fuera del JSON."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _build_merge_messages(partials: list, title: str, year: int | None,
+                          source_hint: str | None, truncated: bool) -> list:
+    """Same instructions as build_analysis_messages, over the summaries of each part."""
+    parts_text = "\n\n".join(
+        f"Parte {i}: {p['summary']}" + (f" (Temas: {', '.join(p['themes'])})" if p["themes"] else "")
+        for i, p in enumerate(partials, 1)
+    )
+    note = " (Solo se resumieron las primeras partes por límite de longitud.)" if truncated else ""
+    messages = build_analysis_messages(parts_text, title + note, year, source_hint)
+    messages[1]["content"] = messages[1]["content"].replace(
+        "Texto del documento completo:",
+        f"El documento es extenso; estos son los resúmenes de sus {len(partials)} partes, en orden:",
+    )
+    return messages
+
+
+def _request_analysis(messages: list, response_format: dict = ANALYSIS_RESPONSE_FORMAT) -> str:
     """
-    Generates a HTML report with search box, source filters, tags and cards per decree.
+    One chat-completions call for an analysis; returns the message content.
+    A structured-output refusal has no content: its refusal text is returned
+    instead, which parse_analysis_content rejects (ok=False).
     """
-    html_parts = []
-    html_parts.append("""<!DOCTYPE html>
+    response = chat_completion(messages, response_format)
+    message = response.choices[0].message
+    if message.content is None:
+        return (getattr(message, "refusal", None) or "").strip()
+    return message.content.strip()
+
+
+def _summarize_chunk(chunk: str, index: int, total: int, title: str, filepath) -> dict:
+    content = _request_analysis(_build_chunk_messages(chunk, index, total, title), CHUNK_RESPONSE_FORMAT)
+    partial, ok = parse_analysis_content(content, "", filepath)
+    if not ok:
+        # Raised so analyze_text leaves the file pending instead of merging
+        # (and caching) a placeholder as one of the partial summaries
+        raise ValueError(f"Invalid analysis of part {index}/{total} of {title}")
+    return {"summary": partial["summary"], "themes": partial["themes"]}
+
+
+def summarize_long_document(text: str, filepath, title: str, year: int | None,
+                            source_hint: str | None) -> str:
+    """
+    Map-reduce analysis for documents over SINGLE_PASS_TOKENS: chunks are
+    summarized concurrently (MAP_CONCURRENCY at a time, at most
+    MAX_DOCUMENT_TOKENS in total) and the partial summaries are merged by a
+    final request into the usual {summary, themes, source} JSON, whose raw
+    content is returned.
+    """
+    chunks = split_decree_text(text, MAP_CHUNK_TOKENS)
+    kept = []
+    used = 0
+    for chunk in chunks:
+        tokens = count_tokens(chunk)
+        if kept and used + tokens > MAX_DOCUMENT_TOKENS:
+            break
+        kept.append(chunk)
+        used += tokens
+    truncated = len(kept) < len(chunks)
+
+    print(f"🤖 Documento extenso {title}: {len(kept)} parte(s), ~{used} tokens")
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as pool:
+        partials = list(pool.map(
+            lambda item: _summarize_chunk(item[1], item[0], len(kept), title, filepath),
+            enumerate(kept, 1),
+        ))
+
+    return _request_analysis(_build_merge_messages(partials, title, year, source_hint, truncated))
+
+
+# ================== CONTENT STORE ==================
+
+def build_content_index(summaries: dict) -> dict:
+    """
+    Maps PDF SHA-256 → stored analysis ({"summary", "themes", "source"}), so
+    content already analyzed under another URL is never sent to ChatGPT again.
+    Entries recorded before hashes were stored, and placeholders stored when
+    no analysis could be made (see PLACEHOLDER_SUMMARIES), don't take part.
+    """
+    index = {}
+    for url, info in summaries.items():
+        digest = info.get("sha256")
+        if digest and digest not in index and not is_placeholder_analysis(info):
+            index[digest] = {
+                "summary": info.get("summary", ""),
+                "themes": list(info.get("themes") or []),
+                "source": info.get("source"),
+                "reused_from": url,
+            }
+    return index
+
+
+# ================== PIPELINE ==================
+
+def process_files(
+    files: list,
+    source_hint: str | None,
+    content_index: dict | None = None,
+    analyzer=None,
+    on_result=None,
+) -> tuple[list, list]:
+    """
+    Runs download → text extraction → analysis for every file as a bounded,
+    staged pipeline, so one file can be waiting on OpenAI while the next is
+    downloading and a third is being parsed:
+
+      - downloads on a thread pool (DOWNLOAD_CONCURRENCY)
+      - PDF text extraction on a process pool (EXTRACT_CONCURRENCY), since it is CPU bound
+      - ChatGPT calls on a thread pool (ANALYZE_CONCURRENCY)
+
+    Produces the same analyses as calling download_file + analyze_file on each
+    file in turn. A file whose download or analysis fails is logged and left
+    out; the others carry on.
+
+    After download, files are deduplicated by content hash: if the bytes are
+    already in `content_index` (see build_content_index) the stored analysis
+    is reused, and identical files within this batch are extracted and
+    analyzed only once.
+
+    `analyzer` replaces analyze_text for the last stage and is called with
+    the same arguments (text, pdf_path, title, year, source_hint, sha256).
+    `on_result(file_info, pdf_path, analysis)` is called (on the calling
+    thread) as soon as each file is done, e.g. to checkpoint it.
+
+    Returns (results, failed) where results is a list of
+    (file_info, pdf_path, analysis) in the same order as `files`, and failed
+    is the list of file_info dicts that could not be processed.
+    """
+    if not files:
+        return [], []
+
+    analyzer = analyzer or analyze_text
+    metrics = get_metrics()
+
+    content_index = dict(content_index or {})
+    results = [None] * len(files)
+    paths = {}
+    failed = []
+    # sha256 -> indices of files waiting on the first file with those bytes
+    in_flight = {}
+
+    def record(i, analysis):
+        results[i] = (files[i], paths[i], analysis)
+        if on_result is not None:
+            on_result(files[i], paths[i], analysis)
+
+    def finish(i, analysis):
+        record(i, analysis)
+        digest = files[i].get("sha256")
+        if digest and not is_placeholder_analysis(analysis):
+            content_index[digest] = dict(analysis, reused_from=files[i]["url"])
+        for j in in_flight.pop(files[i].get("sha256"), [])[1:]:
+            record(j, dict(analysis))
+
+    def fail(i):
+        failed.append(files[i])
+        for j in in_flight.pop(files[i].get("sha256"), [])[1:]:
+            failed.append(files[j])
+
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    # "spawn" so worker processes do not inherit locks held by our threads
+    mp_context = multiprocessing.get_context("spawn")
+
+    extracted = False
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as download_pool, \
+            ProcessPoolExecutor(max_workers=EXTRACT_CONCURRENCY, mp_context=mp_context) as extract_pool, \
+            ThreadPoolExecutor(max_workers=ANALYZE_CONCURRENCY) as analyze_pool:
+
+        pending = {}
+        for i, f in enumerate(files):
+            pending[download_pool.submit(download_file, f)] = ("download", i)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, i = pending.pop(fut)
+                f = files[i]
+
+                try:
+                    value = fut.result()
+                except Exception as e:
+                    if stage == "extract" and not isinstance(e, BrokenProcessPool):
+                        # Same behaviour as analyze_file: record a placeholder summary
+                        log_error(f"Text extraction failed for {paths[i]}: {e}", stage="extract", url=f["url"])
+                        finish(i, _analysis_fallback(SUMMARY_EXTRACTION_FAILED, source_hint))
+                    else:
+                        log_error(f"Pipeline {stage} stage failed for {f['url']}: {e}", stage=stage, url=f["url"])
+                        print(f"   ❌ {f['name']}: {stage} failed (registrado en el log).")
+                        if stage == "download":
+                            failed.append(f)
+                        else:
+                            fail(i)
+                    continue
+
+                if stage == "download":
+                    paths[i] = value
+                    digest = f.get("sha256")
+                    if digest in content_index:
+                        known = content_index[digest]
+                        print(f"   ♻️  {f['name']}: same content as {known['reused_from']}, reusing analysis")
+                        metrics.inc("duplicate_files")
+                        record(i, {k: v for k, v in known.items() if k != "reused_from"})
+                    elif digest in in_flight:
+                        metrics.inc("duplicate_files")
+                        in_flight[digest].append(i)
+                    elif get_openai_client() is None:
+                        record(i, analyze_file(value, f["name"], f.get("year"), source_hint))
+                    else:
+                        in_flight[digest] = [i]
+                        try:
+                            pending[extract_pool.submit(
+                                _pipeline_extract, value, digest, MAX_DOCUMENT_CHARS, metrics.enabled
+                            )] = ("extract", i)
+                        except BrokenProcessPool as e:
+                            # A worker died earlier: fail this file (retried on the next
+                            # run) instead of aborting the whole batch
+                            log_error(f"Pipeline extract stage failed for {f['url']}: {e}", stage="extract", url=f["url"])
+                            print(f"   ❌ {f['name']}: extract failed (registrado en el log).")
+                            fail(i)
+                elif stage == "extract":
+                    text, worker_metrics = value
+                    metrics.merge(worker_metrics)
+                    extracted = True
+                    fut_next = analyze_pool.submit(
+                        analyzer, text, paths[i], f["name"], f.get("year"), source_hint,
+                        f.get("sha256"),
+                    )
+                    pending[fut_next] = ("analyze", i)
+                else:
+                    finish(i, value)
+
+    if extracted:
+        note_text_cached()
+    return [r for r in results if r is not None], failed
+
+
+# ================== SEARCH INDEX ==================
+
+SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Same range the report's JavaScript strips after NFD normalization
+COMBINING_MARKS_RE = re.compile("[\u0300-\u036f]")
+
+
+def fold_text(text: str) -> str:
+    """
+    Lowercases text and strips accents ("Exportación" -> "exportacion").
+    """
+    return COMBINING_MARKS_RE.sub("", unicodedata.normalize("NFD", text)).lower()
+
+
+def search_tokens(text: str) -> list:
+    return SEARCH_TOKEN_RE.findall(fold_text(text))
+
+
+def build_search_index(items: list) -> dict:
+    """
+    Builds an inverted index over the (url, info) items of a report, in the
+    order their cards appear. Returns {"terms": [...], "postings": [...]}:
+    terms are accent-folded tokens of name, summary, themes, year and source,
+    sorted so the browser can binary-search them by prefix, and postings[i]
+    holds the (ascending) card positions containing terms[i].
+    """
+    index = {}
+    for pos, (url, info) in enumerate(items):
+        text = " ".join([
+            info.get("name", ""),
+            info.get("summary", ""),
+            " ".join(info.get("themes") or []),
+            str(info.get("year") or ""),
+            info.get("source") or "",
+        ])
+        for token in set(search_tokens(text)):
+            index.setdefault(token, []).append(pos)
+    terms = sorted(index)
+    return {"terms": terms, "postings": [index[t] for t in terms]}
+
+
+def search_index_json(items: list) -> str:
+    return json.dumps(build_search_index(items), separators=(",", ":"))
+
+
+# Client-side lookup shared by both HTML reports. searchIndex(index, query)
+# returns the Set of card positions matching every query token as a prefix
+# (so "aduana" also finds "aduanas"), or null for an empty query.
+SEARCH_INDEX_JS = r"""
+  function foldText(s) {
+    return s.normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+  }
+
+  function prefixPostings(index, prefix) {
+    const terms = index.terms;
+    let lo = 0, hi = terms.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (terms[mid] < prefix) lo = mid + 1; else hi = mid;
+    }
+    const hits = new Set();
+    for (let i = lo; i < terms.length && terms[i].startsWith(prefix); i++) {
+      for (const pos of index.postings[i]) hits.add(pos);
+    }
+    return hits;
+  }
+
+  function searchIndex(index, query) {
+    const tokens = foldText(query).match(/[a-z0-9]+/g);
+    if (!tokens) return null;
+    let result = null;
+    for (const token of tokens) {
+      const hits = prefixPostings(index, token);
+      result = result === null ? hits : new Set([...result].filter(pos => hits.has(pos)));
+      if (result.size === 0) break;
+    }
+    return result;
+  }
+"""
+
+
+# ================== REPORTS ==================
+
+# <head> (styles) shared by the static report and the lazy docs/ shell
+REPORT_HTML_HEAD = """<!DOCTYPE html>
 <html lang="es">
 <head>
   <meta charset="UTF-8">
@@ -518,7 +3099,182 @@ def generate_html_report(summaries: dict, output_path: Path):
   </style>
 </head>
 <body>
-""")
+"""
+
+
+def _sorted_summaries(summaries: dict) -> list:
+    # Sort by year then filename
+    def sort_key(item):
+        url, info = item
+        return (info.get("year") or 9999, info["name"])
+
+    return sorted(summaries.items(), key=sort_key)
+
+
+class FragmentCache:
+    """
+    Rendered report fragments (one per decree card) keyed by a hash of the
+    fragment kind, URL and summary entry, persisted in one compressed file.
+    Unchanged entries are not re-rendered; fragments not used by the latest
+    full render are pruned on save.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fragments = None
+        self._used = set()
+        self._dirty = False
+
+    def _load(self):
+        if self._fragments is not None:
+            return
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            self._fragments = data.get("fragments", {}) if data.get("version") == REPORT_RENDERER_VERSION else {}
+        except FileNotFoundError:
+            self._fragments = {}
+        except (OSError, EOFError, ValueError) as e:
+            log_error(f"Discarding corrupt report fragment cache {self.path}: {e}", stage="reports", level="warning")
+            self._fragments = {}
+
+    def render(self, kind: str, url: str, info: dict, render_fn) -> str:
+        self._load()
+        key = hashlib.sha256(
+            json.dumps([kind, url, info], ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        self._used.add(key)
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            fragment = render_fn(url, info)
+            self._fragments[key] = fragment
+            self._dirty = True
+        return fragment
+
+    def save(self, prune: bool = False):
+        if self._fragments is None:
+            return
+        if prune:
+            stale = [k for k in self._fragments if k not in self._used]
+            for k in stale:
+                del self._fragments[k]
+            self._dirty = self._dirty or bool(stale)
+            self._used = set()
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump({"version": REPORT_RENDERER_VERSION, "fragments": self._fragments}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+_fragment_cache = None
+
+
+def get_fragment_cache() -> FragmentCache:
+    global _fragment_cache
+    if _fragment_cache is None:
+        _fragment_cache = FragmentCache(CACHE_DIR / "report_fragments.json.gz")
+    return _fragment_cache
+
+
+def _render_markdown_card(url: str, info: dict) -> str:
+    lines = []
+    name = info.get("name", "Sin nombre")
+    summary = info.get("summary", "Sin resumen disponible.")
+    local_path = info.get("local_path", "")
+    year = info.get("year")
+    themes = info.get("themes") or []
+    source = info.get("source") or "Desconocida"
+
+    lines.append(f"## {name}\n")
+    if year:
+        lines.append(f"- Año: **{year}**")
+    lines.append(f"- Fuente: **{source}**")
+    lines.append(f"- URL original: {url}")
+    if local_path:
+        lines.append(f"- Archivo local: `{local_path}`")
+    if themes:
+        lines.append(f"- Temas: {', '.join(themes)}")
+    lines.append("\n**Resumen:**\n")
+    lines.append(summary.strip())
+    lines.append("\n---\n")
+    return "\n".join(lines)
+
+
+def render_markdown_report(summaries: dict) -> str:
+    """
+    Renders a simple Markdown report listing each decree and its summary.
+    """
+    lines = []
+    lines.append("# Decretos – Resumen automático\n")
+    lines.append(f"_Total de decretos resumidos: {len(summaries)}_\n")
+    lines.append("---\n")
+
+    cache = get_fragment_cache()
+    for url, info in _sorted_summaries(summaries):
+        lines.append(cache.render("md", url, info, _render_markdown_card))
+
+    return "\n".join(lines)
+
+
+def generate_markdown_report(summaries: dict, output_path: Path):
+    """
+    Generates a simple Markdown report listing each decree and its summary.
+    The file is left untouched if its contents would not change.
+    """
+    if write_text_if_changed(output_path, render_markdown_report(summaries)):
+        print(f"📄 Reporte Markdown generado en: {output_path}")
+    else:
+        print(f"📄 Reporte Markdown sin cambios: {output_path}")
+    get_fragment_cache().save()
+
+
+def _render_html_card(url: str, info: dict) -> str:
+    html_parts = []
+    name = info.get("name", "Sin nombre")
+    summary = info.get("summary", "Sin resumen disponible.")
+    local_path = info.get("local_path", "")
+    year = info.get("year")
+    themes = info.get("themes") or []
+    source = info.get("source") or "Desconocida"
+
+    card_source_attr = source.replace('"', '&quot;')
+
+    html_parts.append(f'<div class="card" data-source="{card_source_attr}">')
+    html_parts.append(f"<h2>{name}</h2>")
+    html_parts.append('<div class="meta">')
+    html_parts.append(f'<span class="source-pill">{source}</span><br>')
+    if year:
+        html_parts.append(f"Año: <strong>{year}</strong><br>")
+    html_parts.append(f'URL original: <a href="{url}" target="_blank">{url}</a><br>')
+    if local_path:
+        html_parts.append(
+            f"Archivo local (en entorno de ejecución): <code>{local_path}</code><br>"
+        )
+    html_parts.append("</div>")
+
+    if themes:
+        html_parts.append('<div class="tags">')
+        for t in themes:
+            html_parts.append(f'<span class="tag">{t}</span>')
+        html_parts.append("</div>")
+
+    html_parts.append('<div class="summary">')
+    html_parts.append(summary.replace("\n", "<br>\n"))
+    html_parts.append("</div>")
+    html_parts.append("</div>\n")
+    return "".join(html_parts)
+
+
+def render_html_report(summaries: dict) -> str:
+    """
+    Renders a HTML report with search box, source filters, tags and cards per decree.
+    """
+    html_parts = []
+    html_parts.append(REPORT_HTML_HEAD)
 
     html_parts.append("<h1>Decretos – Resumen automático</h1>\n")
     html_parts.append(
@@ -555,54 +3311,22 @@ def generate_html_report(summaries: dict, output_path: Path):
 
     html_parts.append('<div id="cardsContainer">\n')
 
-    def sort_key(item):
-        url, info = item
-        return (info.get("year") or 9999, info["name"])
-
-    for url, info in sorted(summaries.items(), key=sort_key):
-        name = info.get("name", "Sin nombre")
-        summary = info.get("summary", "Sin resumen disponible.")
-        local_path = info.get("local_path", "")
-        year = info.get("year")
-        themes = info.get("themes") or []
-        source = info.get("source") or "Desconocida"
-
-        search_blob = f"{name} {summary} {' '.join(themes)} {year or ''} {source}"
-        search_blob = search_blob.lower().replace('"', '\\"')
-        card_source_attr = source.replace('"', '&quot;')
-
-        html_parts.append(
-            f'<div class="card" data-search="{search_blob}" '
-            f'data-source="{card_source_attr}">'
-        )
-        html_parts.append(f"<h2>{name}</h2>")
-        html_parts.append('<div class="meta">')
-        html_parts.append(f'<span class="source-pill">{source}</span><br>')
-        if year:
-            html_parts.append(f"Año: <strong>{year}</strong><br>")
-        html_parts.append(f'URL original: <a href="{url}" target="_blank">{url}</a><br>')
-        if local_path:
-            html_parts.append(
-                f"Archivo local (en entorno de ejecución): <code>{local_path}</code><br>"
-            )
-        html_parts.append("</div>")
-
-        if themes:
-            html_parts.append('<div class="tags">')
-            for t in themes:
-                html_parts.append(f'<span class="tag">{t}</span>')
-            html_parts.append("</div>")
-
-        html_parts.append('<div class="summary">')
-        html_parts.append(summary.replace("\n", "<br>\n"))
-        html_parts.append("</div>")
-        html_parts.append("</div>\n")
+    cache = get_fragment_cache()
+    items = _sorted_summaries(summaries)
+    for url, info in items:
+        html_parts.append(cache.render("html", url, info, _render_html_card))
 
     html_parts.append("</div>\n")
 
+    # Prebuilt search index, answered by searchIndex() below
+    html_parts.append('<script id="searchIndex" type="application/json">')
+    html_parts.append(search_index_json(items))
+    html_parts.append("</script>\n")
+
     # Client-side search + source filter logic
     html_parts.append("""
-<script>
+<script>""" + SEARCH_INDEX_JS + """
+  const SEARCH_INDEX = JSON.parse(document.getElementById('searchIndex').textContent);
   const input = document.getElementById('searchInput');
   const cardsContainer = document.getElementById('cardsContainer');
   const noResults = document.getElementById('noResults');
@@ -624,14 +3348,15 @@ def generate_html_report(summaries: dict, output_path: Path):
   });
 
   function applyFilters() {
-    const query = input.value.toLowerCase().trim();
+    const query = input.value.trim();
+    const hits = searchIndex(SEARCH_INDEX, query);
     const cards = cardsContainer.getElementsByClassName('card');
     let visibleCount = 0;
 
-    for (const card of cards) {
-      const haystack = card.getAttribute('data-search') || '';
+    for (let i = 0; i < cards.length; i++) {
+      const card = cards[i];
       const cardSource = card.getAttribute('data-source') || '';
-      const matchesText = !query || haystack.indexOf(query) !== -1;
+      const matchesText = hits === null || hits.has(i);
       const matchesSource = !activeSource || cardSource === activeSource;
 
       if (matchesText && matchesSource) {
@@ -653,9 +3378,263 @@ def generate_html_report(summaries: dict, output_path: Path):
 
     html_parts.append("</body>\n</html>\n")
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text("".join(html_parts), encoding="utf-8")
-    print(f"🌐 Reporte HTML generado en: {output_path}")
+    return "".join(html_parts)
+
+
+def generate_html_report(summaries: dict, output_path: Path, html: str | None = None):
+    """
+    Generates a HTML report with search box, source filters, tags and cards per decree.
+    Pass an already rendered `html` to write the same report to several places.
+    The file is left untouched if its contents would not change.
+    """
+    if html is None:
+        html = render_html_report(summaries)
+        get_fragment_cache().save()
+    if write_text_if_changed(output_path, html):
+        print(f"🌐 Reporte HTML generado en: {output_path}")
+    else:
+        print(f"🌐 Reporte HTML sin cambios: {output_path}")
+
+
+# ================== LAZY REPORT (docs/) ==================
+
+# Order of the values in each record of the data/*.json shards
+LAZY_REPORT_FIELDS = ["url", "name", "year", "source", "themes", "summary"]
+
+LAZY_REPORT_BODY = """<h1>Decretos – Resumen automático</h1>
+<p class='subtitle'>Total de decretos resumidos: <strong id="totalCount">…</strong>. Use el buscador y los filtros de fuente para explorar la normativa relevante.</p>
+
+<div class="search-container">
+  <input id="searchInput" class="search-input" type="text" placeholder="Buscar por texto en el título, temas o resumen...">
+</div>
+<div id="sourceFilters" class="source-filters"><button class="source-btn active" data-source="">Todas las fuentes</button></div>
+<div id="noResults" class="no-results" style="display:none;">No se encontraron decretos con ese criterio.</div>
+<div id="cardsContainer"></div>
+<div id="sentinel" class="no-results">Cargando…</div>
+
+<script>""" + SEARCH_INDEX_JS + """
+  const DATA_DIR = 'data/';
+  const PAGE_SIZE = 40;
+
+  const input = document.getElementById('searchInput');
+  const cardsContainer = document.getElementById('cardsContainer');
+  const noResults = document.getElementById('noResults');
+  const sentinel = document.getElementById('sentinel');
+  const sourceFilters = document.getElementById('sourceFilters');
+
+  let fields = [];
+  let index = null;    // search-index.json, fetched in the background (see loadIndex)
+  let indexRequest = null;
+  let hits = null;     // positions matching the query, null when empty
+  let records = [];    // every record loaded so far, in display order
+  let filtered = [];   // records matching the current query/source
+  let rendered = 0;    // how many of `filtered` are in the DOM
+  let loading = true;
+  let activeSource = '';
+
+  function el(tag, cls, text) {
+    const node = document.createElement(tag);
+    if (cls) node.className = cls;
+    if (text !== undefined) node.textContent = text;
+    return node;
+  }
+
+  function toRecord(row, pos) {
+    const r = { pos: pos };
+    fields.forEach((f, i) => { r[f] = row[i]; });
+    r.themes = r.themes || [];
+    return r;
+  }
+
+  function matches(r) {
+    return (hits === null || hits.has(r.pos)) && (!activeSource || r.source === activeSource);
+  }
+
+  function renderCard(r) {
+    const card = el('div', 'card');
+    card.appendChild(el('h2', null, r.name));
+    const meta = el('div', 'meta');
+    meta.appendChild(el('span', 'source-pill', r.source || 'Desconocida'));
+    meta.appendChild(el('br'));
+    if (r.year) {
+      meta.appendChild(document.createTextNode('Año: '));
+      meta.appendChild(el('strong', null, String(r.year)));
+      meta.appendChild(el('br'));
+    }
+    meta.appendChild(document.createTextNode('URL original: '));
+    const link = el('a', null, r.url);
+    link.href = r.url;
+    link.target = '_blank';
+    meta.appendChild(link);
+    card.appendChild(meta);
+    if (r.themes.length) {
+      const tags = el('div', 'tags');
+      r.themes.forEach(t => tags.appendChild(el('span', 'tag', t)));
+      card.appendChild(tags);
+    }
+    card.appendChild(el('div', 'summary', r.summary));
+    return card;
+  }
+
+  function renderMore() {
+    const frag = document.createDocumentFragment();
+    const end = Math.min(rendered + PAGE_SIZE, filtered.length);
+    for (; rendered < end; rendered++) frag.appendChild(renderCard(filtered[rendered]));
+    cardsContainer.appendChild(frag);
+    updateStatus();
+  }
+
+  function updateStatus() {
+    const query = input.value.trim();
+    const searching = query && index === null;
+    noResults.style.display = (!loading && !searching && filtered.length === 0 && (query || activeSource)) ? 'block' : 'none';
+    sentinel.style.display = (loading || searching || rendered < filtered.length) ? 'block' : 'none';
+  }
+
+  function showError(err) {
+    loading = false;
+    sentinel.style.display = 'block';
+    sentinel.textContent = 'No se pudieron cargar los datos (' + err + ').';
+  }
+
+  // The search index is not needed to show cards, so it is fetched on the
+  // first search or once the shards are in, whichever comes first
+  function loadIndex() {
+    if (!indexRequest) {
+      indexRequest = fetch(DATA_DIR + 'search-index.json')
+        .then(r => r.json())
+        .then(data => { index = data; if (input.value.trim()) applyFilters(); })
+        .catch(showError);
+    }
+  }
+
+  function applyFilters() {
+    const query = input.value.trim();
+    if (query && index === null) {
+      loadIndex();  // applyFilters runs again once the index is in
+      hits = new Set();
+    } else {
+      hits = query ? searchIndex(index, query) : null;
+    }
+    filtered = records.filter(matches);
+    rendered = 0;
+    cardsContainer.textContent = '';
+    renderMore();
+  }
+
+  function sentinelVisible() {
+    return sentinel.getBoundingClientRect().top < window.innerHeight + 400;
+  }
+
+  new IntersectionObserver(entries => {
+    if (entries.some(e => e.isIntersecting) && rendered < filtered.length) renderMore();
+  }, { rootMargin: '400px' }).observe(sentinel);
+
+  input.addEventListener('input', applyFilters);
+
+  function addSourceButton(src, label) {
+    const btn = el('button', 'source-btn', label);
+    btn.setAttribute('data-source', src);
+    sourceFilters.appendChild(btn);
+  }
+
+  sourceFilters.addEventListener('click', ev => {
+    const btn = ev.target.closest('.source-btn');
+    if (!btn) return;
+    activeSource = btn.getAttribute('data-source') || '';
+    sourceFilters.querySelectorAll('.source-btn').forEach(b => b.classList.remove('active'));
+    btn.classList.add('active');
+    applyFilters();
+  });
+
+  async function load() {
+    const manifest = await (await fetch(DATA_DIR + 'index.json')).json();
+    applyFilters();  // a query restored by the browser starts loading the index
+    fields = manifest.fields;
+    document.getElementById('totalCount').textContent = manifest.total;
+    manifest.sources.forEach(src => addSourceButton(src, src));
+
+    // Shards arrive newest year first; cards are shown as soon as the first one is in
+    for (const shard of manifest.shards) {
+      const rows = await (await fetch(DATA_DIR + shard.file)).json();
+      const added = rows.map((row, i) => toRecord(row, records.length + i));
+      records = records.concat(added);
+      filtered = filtered.concat(added.filter(matches));
+      if (sentinelVisible()) renderMore(); else updateStatus();
+    }
+    loading = false;
+    updateStatus();
+    loadIndex();
+  }
+
+  load().catch(showError);
+</script>
+</body>
+</html>
+"""
+
+
+def _shard_name(year) -> str:
+    return f"decretos-{year}.json" if year else "decretos-sin-anio.json"
+
+
+def generate_lazy_html_report(summaries: dict, output_dir: Path):
+    """
+    Generates the docs/ report as a small HTML shell (output_dir/index.html)
+    plus a compact JSON dataset in output_dir/data/: index.json (totals,
+    sources, shard list), one decretos-<year>.json shard per year, each
+    record being a list in LAZY_REPORT_FIELDS order, and search-index.json
+    (see build_search_index) over the records in shard order. The page fetches the
+    shards newest year first and renders cards in pages as the user scrolls
+    or filters, so first paint does not depend on the size of the corpus.
+    Files whose contents would not change are not rewritten; shards of years
+    that no longer have decrees are removed.
+    """
+    data_dir = output_dir / "data"
+
+    shards = {}
+    items = {}
+    for url, info in _sorted_summaries(summaries):
+        items.setdefault(info.get("year"), []).append((url, info))
+        record = [
+            url,
+            info.get("name", "Sin nombre"),
+            info.get("year"),
+            info.get("source") or "Desconocida",
+            info.get("themes") or [],
+            info.get("summary", "Sin resumen disponible."),
+        ]
+        shards.setdefault(info.get("year"), []).append(record)
+
+    years = sorted(shards, key=lambda y: y or 0, reverse=True)
+    sources = sorted({info.get("source") for info in summaries.values() if info.get("source")})
+    manifest = {
+        "fields": LAZY_REPORT_FIELDS,
+        "total": len(summaries),
+        "sources": sources,
+        "shards": [{"year": y, "file": _shard_name(y), "count": len(shards[y])} for y in years],
+    }
+
+    written = 0
+    for year in years:
+        payload = json.dumps(shards[year], ensure_ascii=False, separators=(",", ":"))
+        written += write_text_if_changed(data_dir / _shard_name(year), payload)
+    payload = json.dumps(manifest, ensure_ascii=False, separators=(",", ":"))
+    written += write_text_if_changed(data_dir / "index.json", payload)
+    ordered = [item for year in years for item in items[year]]
+    written += write_text_if_changed(data_dir / "search-index.json", search_index_json(ordered))
+    written += write_text_if_changed(output_dir / "index.html", REPORT_HTML_HEAD + LAZY_REPORT_BODY)
+
+    current = {_shard_name(y) for y in years}
+    for old in data_dir.glob("decretos-*.json"):
+        if old.name not in current:
+            old.unlink()
+            written += 1
+
+    if written:
+        print(f"🌐 Reporte HTML (carga diferida) generado en: {output_dir / 'index.html'} ({len(years)} año(s))")
+    else:
+        print(f"🌐 Reporte HTML (carga diferida) sin cambios: {output_dir / 'index.html'}")
 
 
 # ================== EMAIL NOTIFICATIONS ==================
@@ -703,6 +3682,9 @@ def send_email_notification(new_items: list, html_report_path: Path | None = Non
 
     body = "\n".join(lines)
 
+    import smtplib
+    from email.message import EmailMessage
+
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = EMAIL_FROM
@@ -717,110 +3699,811 @@ def send_email_notification(new_items: list, html_report_path: Path | None = Non
             server.send_message(msg)
         print("   ✓ Email enviado")
     except Exception as e:
-        log_error(f"Error sending email notification: {e}")
+        log_error(f"Error sending email notification: {e}", stage="email")
         print("   ❌ Error enviando el email (registrado en el log).")
 
 
 # ================== MAIN FLOW ==================
 
-def main():
-    try:
-        all_decree_files = []
+def scrape_index_pages(years: list, fetch_cache: dict | None = None) -> tuple[list, list]:
+    """
+    Fetches the index page of each year and extracts its decree files.
+    With a fetch cache, unchanged pages are skipped (see fetch_page).
+    Returns (decree_files, changed_years).
+    """
+    all_decree_files = []
+    changed_years = []
+
+    for year in years:
+        url = BASE_URL.format(year=year)
+        print(f"Fetching index page for {year}: {url} ...")
+        index_html = fetch_page(url, fetch_cache)
+        if index_html is None:
+            print(f"✓ Index page for {year} unchanged, skipping.\n")
+            continue
+        changed_years.append(year)
+        decree_files = extract_decree_files(index_html, url)
+        for f in decree_files:
+            f["year"] = year
+        print(f"✓ Found {len(decree_files)} decree files for {year}.\n")
+        all_decree_files.extend(decree_files)
+
+    return all_decree_files, changed_years
+
+
+def summary_entry(file_info: dict, pdf_path, analysis: dict, source_hint: str | None) -> dict:
+    """The summaries.json entry for a processed file."""
+    return {
+        "name": file_info["name"],
+        "local_path": str(pdf_path),
+        "summary": analysis.get("summary", ""),
+        "themes": analysis.get("themes") or [],
+        "source": analysis.get("source") or source_hint,
+        "year": file_info.get("year"),
+        "sha256": file_info.get("sha256"),
+    }
+
+
+def email_item(url: str, entry: dict) -> dict:
+    return {
+        "url": url,
+        "name": entry["name"],
+        "summary": entry["summary"],
+        "themes": entry["themes"],
+        "source": entry["source"],
+        "year": entry["year"],
+    }
 
-        # --- Multi-year scraping ---
-        for year in YEARS:
-            url = BASE_URL.format(year=year)
-            print(f"Fetching index page for {year}: {url} ...")
-            index_html = fetch_page(url)
-            decree_files = extract_decree_files(index_html, url)
-            for f in decree_files:
-                f["year"] = year
-            print(f"✓ Found {len(decree_files)} decree files for {year}.\n")
-            all_decree_files.extend(decree_files)
 
-        print(f"✓ Total decree files across years {YEARS}: {len(all_decree_files)}\n")
+def generate_reports(summaries: dict) -> Path | None:
+    """Writes the Markdown/HTML reports. Returns the root HTML report path."""
+    if not summaries:
+        return None
 
-        # Load previous state and summaries
+    # Keep file names for backwards compatibility
+    md_path = Path("report_decretos_2025.md")
+    html_path_root = Path("report_decretos_2025.html")
+    docs_html_path = Path("docs") / "index.html"
+
+    generate_markdown_report(summaries, md_path)
+    # Render once, write to every target (unchanged files are not rewritten)
+    html = render_html_report(summaries)
+    generate_html_report(summaries, html_path_root, html)
+    if DOCS_REPORT_MODE == "lazy":
+        generate_lazy_html_report(summaries, docs_html_path.parent)
+    else:
+        generate_html_report(summaries, docs_html_path, html)
+    get_fragment_cache().save(prune=True)
+    return html_path_root
+
+
+def run_once(years: list | None = None) -> list:
+    """
+    One check of the index pages of `years` (default YEARS): new decrees are
+    downloaded, analyzed, stored and reported. Returns the years whose index
+    page changed.
+
+    With METRICS_ENABLED the run's metrics are written at the end (see
+    finish_metrics), whether it succeeds or fails.
+    """
+    metrics = start_metrics()
+    run_info = {"status": "error", "years": list(years or YEARS)}
+    buffer_error_log()
+    try:
+        fetch_cache = load_fetch_cache()
+
+        # --- Multi-year scraping ---
+        with metrics.timer("stage", stage="scrape"):
+            all_decree_files, changed_years = scrape_index_pages(years or YEARS, fetch_cache)
+        run_info.update(changed_years=changed_years, decree_files=len(all_decree_files))
+
+        # Decrees that failed on earlier runs are retried directly, whether or
+        # not their index page changed, until FILE_MAX_ATTEMPTS
+        failures = load_failed_files()
+        retry_files = [f for f, attempts in failures.values() if attempts < FILE_MAX_ATTEMPTS]
+
+        revalidate = revalidation_due()
+        if not changed_years and not has_checkpoints() and not revalidate and not retry_files:
+            # Nothing changed upstream: no parsing, downloads, analysis or
+            # reports, and the stored summaries are not even loaded
+            save_fetch_cache(fetch_cache)
+            print("✓ No index page changed since last run. Nothing to do.")
+            run_info["status"] = "unchanged"
+            return changed_years
+
+        # Load previous state and summaries, plus whatever an interrupted
+        # run managed to checkpoint before it died
         known = load_known_files()
         summaries = load_summaries()
+        replayed = replay_journal(known, summaries)
+        if replayed:
+            print(f"↺ Resuming: {len(replayed)} file(s) recovered from the journal of an interrupted run\n")
 
-        # Process anything that does NOT have a summary yet
-        new_files = [f for f in all_decree_files if f["url"] not in summaries]
+        print(f"✓ Total decree files across years {changed_years}: {len(all_decree_files)}\n")
+
+        # Process anything that does NOT have a summary yet, except decrees
+        # given up on after FILE_MAX_ATTEMPTS failures
+        new_files = [
+            f for f in all_decree_files
+            if f["url"] not in summaries and failures.get(f["url"], (None, 0))[1] < FILE_MAX_ATTEMPTS
+        ]
+        listed = {f["url"] for f in new_files}
+        new_files += [f for f in retry_files if f["url"] not in summaries and f["url"] not in listed]
 
         print(f"🆕 Files to summarize: {len(new_files)}")
         for f in new_files:
             year_display = f.get("year") or "?"
             print(f"   - ({year_display}) {f['name']}")
 
-        processed_items_for_email = []
-
-        # Process each file that still needs a summary
-        for f in new_files:
-            year = f.get("year")
-            source_hint = DEFAULT_SOURCE  # later you can make this dynamic per source
-
-            # 1) Download
-            pdf_path = download_file(f)
-
-            # 2) Analyze (summary + themes + source)
-            analysis = analyze_file(pdf_path, f["name"], year, source_hint)
-            summary = analysis.get("summary", "")
-            themes = analysis.get("themes") or []
-            source = analysis.get("source") or source_hint
+        processed_items_for_email = [email_item(url, summaries[url]) for url in replayed]
+
+        # 1) Download + 2) Analyze (summary + themes + source), concurrently,
+        # checkpointing each file to the journal as soon as it is done
+        source_hint = DEFAULT_SOURCE  # later you can make this dynamic per source
+        with metrics.timer("stage", stage="pipeline"):
+            processed, failed = process_files(
+                new_files,
+                source_hint,
+                build_content_index(summaries),
+                on_result=lambda f, pdf_path, analysis: checkpoint_file(
+                    f, summary_entry(f, pdf_path, analysis, source_hint)
+                ),
+            )
+        run_info.update(
+            new_files=len(new_files), replayed=len(replayed), processed=len(processed), failed=len(failed)
+        )
 
+        for f, pdf_path, analysis in processed:
             # 3) Save info in summaries dict (keyed by URL)
-            summaries[f["url"]] = {
-                "name": f["name"],
-                "local_path": str(pdf_path),
-                "summary": summary,
-                "themes": themes,
-                "source": source,
-                "year": year,
-            }
+            summaries[f["url"]] = summary_entry(f, pdf_path, analysis, source_hint)
 
             # 4) Mark as known
             known[f["url"]] = f
 
             # 5) Collect for email
-            processed_items_for_email.append({
-                "url": f["url"],
-                "name": f["name"],
-                "summary": summary,
-                "themes": themes,
-                "source": source,
-                "year": year,
-            })
+            processed_items_for_email.append(email_item(f["url"], summaries[f["url"]]))
+
+        # Files that failed are retried on the next runs (see FILE_MAX_ATTEMPTS)
+        record_failed_files(failed, [url for url in failures if url in summaries])
+
+        # Check whether some already summarized PDFs were replaced upstream,
+        # and analyze again those whose content changed
+        if revalidate:
+            with metrics.timer("stage", stage="revalidate"):
+                replaced = revalidate_attachments(known, summaries)
+                revised, _ = process_files(replaced, source_hint, build_content_index(summaries))
+            for f, pdf_path, analysis in revised:
+                summaries[f["url"]] = summary_entry(f, pdf_path, analysis, source_hint)
+                known[f["url"]] = f
+                item = email_item(f["url"], summaries[f["url"]])
+                item["name"] += " (documento actualizado en MINCIT)"
+                processed_items_for_email.append(item)
+            run_info["revised"] = len(revised)
 
         # Save updated state and summaries
-        save_known_files(known)
-        save_summaries(summaries)
+        with metrics.timer("stage", stage="store"):
+            save_known_files(known)
+            save_summaries(summaries)
+            # Only remember the index pages once everything found on them is stored,
+            # so a crashed run is retried in full on the next tick
+            save_fetch_cache(fetch_cache)
+            compact_journal()
+            export_state_json()
 
         print("\n✓ Done.")
-        if new_files:
+        if new_files or replayed:
             print("📝 Summaries stored/updated in summaries.json")
         else:
             print("No new summaries needed.")
 
         # Generate reports if there is at least one summary
-        html_path_root = None
-        if summaries:
-            # Keep file names for backwards compatibility
-            md_path = Path("report_decretos_2025.md")
-            html_path_root = Path("report_decretos_2025.html")
-            docs_html_path = Path("docs") / "index.html"
-
-            generate_markdown_report(summaries, md_path)
-            generate_html_report(summaries, html_path_root)
-            generate_html_report(summaries, docs_html_path)
+        with metrics.timer("stage", stage="reports"):
+            html_path_root = generate_reports(summaries)
 
         # Send email for new items
         if processed_items_for_email:
-            send_email_notification(processed_items_for_email, html_report_path=html_path_root)
+            with metrics.timer("stage", stage="email"):
+                send_email_notification(processed_items_for_email, html_report_path=html_path_root)
+
+        run_info["status"] = "ok"
+        return changed_years
+
+    except Exception as e:
+        log_error(f"Unhandled error in run_once(): {e}", stage="run")
+        raise
+    finally:
+        finish_metrics(run_info)
+        flush_error_log(stop=True)
+
+
+def main():
+    run_once(YEARS)
+
+
+# ================== DAEMON ==================
+
+class PollScheduler:
+    """
+    Per-URL adaptive polling schedule for --daemon. Each index URL keeps its
+    own interval: halved when a check finds a change, stretched by
+    DAEMON_BACKOFF_FACTOR when it does not, clamped to
+    [DAEMON_MIN_INTERVAL, DAEMON_MAX_INTERVAL]. Checks due during quiet
+    hours wait DAEMON_QUIET_FACTOR times longer, and every delay gets
+    ±DAEMON_JITTER random jitter. The schedule is kept in the state
+    database, so a restarted daemon continues where it left off.
+    """
+
+    META_KEY = "poll_schedule"
+
+    def __init__(self, urls: list, store: StateStore | None = None):
+        self.store = store or get_state_store()
+        saved = json.loads(self.store.get_meta(self.META_KEY) or "{}")
+        now = time.time()
+        self.entries = {}
+        for url in urls:
+            entry = saved.get(url) or {"interval": DAEMON_INITIAL_INTERVAL, "changes": 0, "checks": 0}
+            # First check right away (spread a little) unless one is already scheduled
+            entry.setdefault("next_due", now + random.uniform(0, 5))
+            self.entries[url] = entry
+
+    def due(self, now: float | None = None) -> list:
+        now = time.time() if now is None else now
+        return [url for url, e in self.entries.items() if e["next_due"] <= now]
+
+    def seconds_until_next(self, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        return max(0.0, min(e["next_due"] for e in self.entries.values()) - now)
+
+    def record(self, url: str, changed: bool, now: float | None = None):
+        now = time.time() if now is None else now
+        e = self.entries[url]
+        e["checks"] += 1
+        if changed:
+            e["changes"] += 1
+            e["last_change"] = now
+            e["interval"] = e["interval"] / 2
+        else:
+            e["interval"] = e["interval"] * DAEMON_BACKOFF_FACTOR
+        e["interval"] = min(DAEMON_MAX_INTERVAL, max(DAEMON_MIN_INTERVAL, e["interval"]))
+        e["last_check"] = now
+
+        delay = e["interval"]
+        if in_quiet_hours(now + delay):
+            delay *= DAEMON_QUIET_FACTOR
+        delay *= 1 + random.uniform(-DAEMON_JITTER, DAEMON_JITTER)
+        e["next_due"] = now + delay
+
+    def save(self):
+        self.store.set_meta(self.META_KEY, json.dumps(self.entries))
+
+
+def in_quiet_hours(timestamp: float) -> bool:
+    """Whether timestamp falls inside DAEMON_QUIET_HOURS ("start-end", local hours)."""
+    if not DAEMON_QUIET_HOURS:
+        return False
+    start, end = (int(h) for h in DAEMON_QUIET_HOURS.split("-"))
+    hour = datetime.fromtimestamp(timestamp, DAEMON_TIMEZONE).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def run_daemon(years: list | None = None):
+    """
+    Keeps the process (HTTP pool, caches, database) alive and checks each
+    year's index page on its own adaptive schedule (see PollScheduler),
+    running the usual pipeline for the years whose page changed.
+    """
+    years = years or YEARS
+    url_years = {BASE_URL.format(year=year): year for year in years}
+    scheduler = PollScheduler(list(url_years))
+    print(f"👀 Daemon started for {len(url_years)} index page(s). Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            due = scheduler.due()
+            if due:
+                due_years = [url_years[url] for url in due]
+                try:
+                    changed_years = run_once(due_years)
+                except Exception as e:
+                    # Already logged by run_once; back off as if nothing changed
+                    print(f"❌ Check failed for {due_years}: {e}")
+                    changed_years = []
+                for url in due:
+                    scheduler.record(url, url_years[url] in changed_years)
+                scheduler.save()
+                for url in due:
+                    e = scheduler.entries[url]
+                    next_check = datetime.fromtimestamp(e["next_due"], DAEMON_TIMEZONE)
+                    print(f"⏱️  Next check of {url_years[url]} at {next_check:%Y-%m-%d %H:%M} "
+                          f"(interval {e['interval'] / 60:.0f} min)")
+            time.sleep(min(scheduler.seconds_until_next(), DAEMON_MAX_SLEEP))
+    except KeyboardInterrupt:
+        scheduler.save()
+        print("\n👋 Daemon stopped.")
+
+
+def print_search_results(results: list, as_json: bool = False):
+    if as_json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+    if not results:
+        print("No se encontraron decretos con ese criterio.")
+        return
+    for r in results:
+        print(f"{r['score']:6.2f}  {r['year'] or '----'}  {r['name']}")
+        print(f"        {r['url']}")
+        if r["themes"]:
+            print(f"        Temas: {', '.join(r['themes'])}")
+        if r["snippet"]:
+            print(f"        {' '.join(r['snippet'].split())}")
+
+
+# ================== BATCH BACKFILL ==================
+
+def load_batch_state():
+    path = Path(BATCH_STATE_FILE)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        log_error(f"{BATCH_STATE_FILE} is empty or invalid JSON: {e}. Ignoring pending batch.", stage="batch")
+        return None
+
+
+def save_batch_state(state):
+    if state is None:
+        Path(BATCH_STATE_FILE).unlink(missing_ok=True)
+        return
+    write_text_if_changed(Path(BATCH_STATE_FILE), json.dumps(state, indent=2, ensure_ascii=False))
+
+
+def prepare_batch_request(
+    text: str,
+    filepath: Path,
+    title: str,
+    year: int | None,
+    source_hint: str | None,
+    document_hash: str | None = None,
+) -> dict:
+    """
+    Analyzer for process_files in batch mode. Instead of calling ChatGPT it
+    returns {"batch_request": {...}} with the chat-completions body to submit,
+    unless the analysis is already cached or there is no text to analyze.
+    The request's custom_id is the LLM cache key, so batch results land in
+    the same cache as regular analyses.
+    """
+    if not text:
+        return _analysis_fallback(SUMMARY_NO_TEXT, source_hint)
+
+    messages = build_analysis_messages(text, title, year, source_hint)
+    document_hash = document_hash or hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cache_key = llm_cache_key(ANALYSIS_MODEL, messages, document_hash)
+    if not LLM_CACHE_REFRESH:
+        cached = get_llm_cache().get(cache_key)
+        if cached is not None:
+            print(f"🤖 Using cached analysis for {title}")
+            return cached
+
+    return {
+        "batch_request": {
+            "custom_id": cache_key,
+            "body": {
+                "model": ANALYSIS_MODEL,
+                "messages": messages,
+                "response_format": ANALYSIS_RESPONSE_FORMAT,
+            },
+        },
+        "source": source_hint or "Entidad emisora desconocida",
+    }
+
+
+def submit_batch(bodies: dict) -> str:
+    """Uploads {custom_id: body} as a JSONL batch input file and creates the batch."""
+    lines = [
+        json.dumps(
+            {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body},
+            ensure_ascii=False,
+        )
+        for custom_id, body in bodies.items()
+    ]
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+    client = get_openai_client()
+    upload = client.files.create(file=("watcher_batch.jsonl", payload), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=upload.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    print(f"📦 Batch {batch.id} submitted with {len(lines)} request(s)")
+    return batch.id
+
+
+def wait_for_batch(batch_id: str, poll_interval: float, timeout: float):
+    """Polls a batch until it finishes. Returns the batch, or None on timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = get_openai_client().batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = f" ({counts.completed}/{counts.total})" if counts else ""
+        print(f"   ⏳ Batch {batch_id}: {batch.status}{progress}")
+        if batch.status in ("completed", "failed", "expired", "cancelled"):
+            return batch
+        if time.monotonic() + poll_interval > deadline:
+            return None
+        time.sleep(poll_interval)
+
+
+def read_batch_results(batch) -> dict:
+    """Returns {custom_id: assistant message content} for successful requests."""
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in get_openai_client().files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                body = response.get("body") or {}
+                results[record["custom_id"]] = body["choices"][0]["message"]["content"].strip()
+            else:
+                log_error(
+                    f"Batch request {record.get('custom_id')} failed: "
+                    f"{record.get('error') or response}",
+                    stage="batch",
+                )
+    return results
+
+
+def run_batch_backfill(years: list | None = None,
+                       poll_interval: float = BATCH_POLL_INTERVAL,
+                       timeout: float = BATCH_POLL_TIMEOUT):
+    """
+    Backfill mode: analyzes every decree that has no summary yet through the
+    OpenAI Batch API instead of one chat-completion call per decree.
+
+    Pending files are downloaded and extracted by the usual pipeline, their
+    prompts are written to a JSONL batch and submitted, and the batch is
+    polled until it completes. The batch id and its items are kept in
+    BATCH_STATE_FILE, so if polling times out the next invocation picks the
+    same batch up instead of submitting a new one. Merging is idempotent:
+    URLs that already have a summary are never overwritten.
+    """
+    if get_openai_client() is None:
+        print("⚠️  OPENAI_API_KEY not set, batch backfill needs the OpenAI API.")
+        return
+
+    years = years or YEARS
+    known = load_known_files()
+    summaries = load_summaries()
+    processed_items_for_email = []
+    state = load_batch_state()
+
+    if state is None:
+        all_decree_files, _ = scrape_index_pages(years)
+        new_files = [f for f in all_decree_files if f["url"] not in summaries]
+        print(f"🆕 Files to summarize: {len(new_files)}")
+
+        source_hint = DEFAULT_SOURCE
+        processed, failed = process_files(
+            new_files, source_hint, build_content_index(summaries), analyzer=prepare_batch_request
+        )
+
+        bodies = {}
+        items = {}
+        for f, pdf_path, result in processed:
+            request = result.get("batch_request")
+            if request is None:
+                # Cached analysis, duplicate content or nothing to analyze
+                summaries[f["url"]] = summary_entry(f, pdf_path, result, source_hint)
+                known[f["url"]] = f
+                processed_items_for_email.append(email_item(f["url"], summaries[f["url"]]))
+                continue
+            bodies[request["custom_id"]] = request["body"]
+            items[f["url"]] = {
+                "file": f,
+                "local_path": str(pdf_path),
+                "custom_id": request["custom_id"],
+                "source_hint": result["source"],
+            }
+
+        save_known_files(known)
+        save_summaries(summaries)
+        export_state_json()
+
+        if bodies:
+            batch_id = submit_batch(bodies)
+            state = {
+                "batch_id": batch_id,
+                "submitted_at": datetime.utcnow().isoformat() + "Z",
+                "items": items,
+            }
+            save_batch_state(state)
+        else:
+            print("No requests to submit.")
+
+    if state is not None:
+        batch = wait_for_batch(state["batch_id"], poll_interval, timeout)
+        if batch is None:
+            print(f"⏳ Batch {state['batch_id']} still running. Run --batch again to collect it.")
+            return
+
+        if batch.status == "completed":
+            results = read_batch_results(batch)
+        else:
+            log_error(f"Batch {batch.id} ended with status {batch.status}", stage="batch")
+            results = {}
+
+        merged = 0
+        for url, item in state["items"].items():
+            if url in summaries:
+                continue
+            content = results.get(item["custom_id"])
+            if content is None:
+                # Left for the next run (regular or batch)
+                continue
+            analysis, ok = parse_analysis_content(content, item["source_hint"], item["local_path"])
+            if not ok:
+                # Refused or cut off: left for the next run, like a missing result
+                continue
+            get_llm_cache().put(item["custom_id"], analysis)
+            summaries[url] = summary_entry(item["file"], item["local_path"], analysis, item["source_hint"])
+            known[url] = item["file"]
+            processed_items_for_email.append(email_item(url, summaries[url]))
+            merged += 1
+
+        save_known_files(known)
+        save_summaries(summaries)
+        export_state_json()
+        save_batch_state(None)
+        print(f"✓ Merged {merged} analysis(es) from batch {batch.id}")
+
+    html_path_root = generate_reports(summaries)
+    if processed_items_for_email:
+        send_email_notification(processed_items_for_email, html_report_path=html_path_root)
+
+
+# ================== BACKFILL QUEUE ==================
+
+def parse_years(specs: list) -> list:
+    """["2016-2019", "2023"] -> [2016, 2017, 2018, 2019, 2023]"""
+    years = set()
+    for spec in specs:
+        for part in str(spec).split(","):
+            start, _, end = part.strip().partition("-")
+            years.update(range(int(start), int(end or start) + 1))
+    return sorted(years)
+
+
+def enqueue_backfill_years(years: list, summaries: dict, rescan: bool = False) -> int:
+    """
+    Scans the index page of each year not scanned yet (all of them with
+    rescan) and queues its decrees that have no summary. Returns how many
+    files were queued.
+    """
+    store = get_state_store()
+    scanned = store.backfill_scanned_years()
+    queued = 0
+    for year in years:
+        if year in scanned and not rescan:
+            continue
+        url = BASE_URL.format(year=year)
+        try:
+            index_html = fetch_page(url)
+        except Exception as e:
+            # Already logged; the year is scanned again next time
+            print(f"   ❌ Could not fetch the index page for {year}: {e}")
+            continue
+        files = extract_decree_files(index_html, url)
+        for f in files:
+            f["year"] = year
+        added = store.enqueue_backfill(year, [f for f in files if f["url"] not in summaries], len(files))
+        queued += added
+        print(f"📥 {year}: {len(files)} decree(s) on the index page, {added} queued")
+    return queued
+
+
+def run_backfill(years: list, time_budget: float = BACKFILL_TIME_BUDGET,
+                 token_budget: int = BACKFILL_TOKEN_BUDGET, rescan: bool = False) -> dict:
+    """
+    Resumable historical backfill. Decrees of `years` are queued once in the
+    state database (see enqueue_backfill_years), then processed by the usual
+    pipeline BACKFILL_BATCH_SIZE at a time. Each file is checkpointed to the
+    journal and marked done in the queue as soon as it is analyzed, and the
+    summaries are saved after every batch.
+
+    A new batch is only started if, judging by the batches so far, it should
+    fit in what is left of time_budget (seconds) and token_budget (OpenAI
+    tokens); 0 means no limit. Whatever is left stays queued for the next
+    invocation. No email is sent for backfilled decrees.
+
+    Returns the queue counts by status.
+    """
+    started = time.monotonic()
+    run_started_at = datetime.utcnow().isoformat() + "Z"
+    metrics = start_metrics()
+    run_info = {"command": "backfill", "status": "error", "years": years}
+    buffer_error_log()
+    try:
+        store = get_state_store()
+        known = load_known_files()
+        summaries = load_summaries()
+        replayed = replay_journal(known, summaries)
+        if replayed:
+            print(f"↺ Resuming: {len(replayed)} file(s) recovered from the journal of an interrupted run")
+
+        with metrics.timer("stage", stage="scrape"):
+            enqueue_backfill_years(years, summaries, rescan)
+        counts = store.backfill_counts()
+        print(f"📋 Backfill queue: {counts.get('pending', 0)} pending, {counts.get('done', 0)} done, "
+              f"{counts.get('failed', 0)} given up\n")
+
+        limiter = get_openai_limiter()
+        tokens_at_start = limiter.tokens_used
+        source_hint = DEFAULT_SOURCE
+        batches = processed_total = 0
+        batch_seconds = batch_tokens = 0.0
+        stop_reason = "queue empty"
+
+        def done(f, pdf_path, analysis):
+            checkpoint_file(f, summary_entry(f, pdf_path, analysis, source_hint))
+            store.finish_backfill_item(f["url"])
+
+        while True:
+            # Projected cost of one more batch: the average of those so far
+            elapsed = time.monotonic() - started + (batch_seconds / batches if batches else 0)
+            tokens = limiter.tokens_used - tokens_at_start + (batch_tokens / batches if batches else 0)
+            if time_budget and elapsed > time_budget:
+                stop_reason = f"time budget ({time_budget:.0f}s)"
+                break
+            if token_budget and tokens > token_budget:
+                stop_reason = f"token budget ({token_budget} tokens)"
+                break
+
+            items = store.next_backfill_items(BACKFILL_BATCH_SIZE, run_started_at)
+            if not items:
+                break
+            # Summarized since they were queued (by a regular run, or a
+            # checkpoint whose queue update was lost): nothing to do
+            pending = []
+            for f in items:
+                if f["url"] in summaries:
+                    store.finish_backfill_item(f["url"])
+                else:
+                    pending.append(f)
+            if not pending:
+                continue
+
+            batch_start = time.monotonic()
+            tokens_before = limiter.tokens_used
+            print(f"🧱 Batch {batches + 1}: {len(pending)} file(s)")
+            with metrics.timer("stage", stage="pipeline"):
+                processed, failed = process_files(
+                    pending, source_hint, build_content_index(summaries), on_result=done
+                )
+            for f in failed:
+                store.fail_backfill_item(f["url"], BACKFILL_MAX_ATTEMPTS)
+            for f, pdf_path, analysis in processed:
+                summaries[f["url"]] = summary_entry(f, pdf_path, analysis, source_hint)
+                known[f["url"]] = f
+            with metrics.timer("stage", stage="store"):
+                save_known_files(known)
+                save_summaries(summaries)
+                compact_journal()
+
+            batches += 1
+            processed_total += len(processed)
+            batch_seconds += time.monotonic() - batch_start
+            batch_tokens += limiter.tokens_used - tokens_before
+
+        counts = store.backfill_counts()
+        print(f"\n✓ Backfill stopped ({stop_reason}): {processed_total} file(s) in {batches} batch(es), "
+              f"{limiter.tokens_used - tokens_at_start} tokens, {time.monotonic() - started:.0f}s")
+        print(f"📋 Backfill queue: {counts.get('pending', 0)} pending, {counts.get('done', 0)} done, "
+              f"{counts.get('failed', 0)} given up")
+
+        if processed_total or replayed:
+            if replayed:
+                save_known_files(known)
+                save_summaries(summaries)
+                compact_journal()
+            export_state_json()
+            with metrics.timer("stage", stage="reports"):
+                generate_reports(summaries)
+
+        run_info.update(status="ok", stop_reason=stop_reason, batches=batches,
+                        processed=processed_total, queue=counts)
+        return counts
 
     except Exception as e:
-        log_error(f"Unhandled error in main(): {e}")
+        log_error(f"Unhandled error in run_backfill(): {e}", stage="backfill")
         raise
+    finally:
+        finish_metrics(run_info)
+        flush_error_log(stop=True)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Watch MINCIT for new decrees and summarize them.")
+    parser.add_argument(
+        "--refresh-llm-cache",
+        action="store_true",
+        help="ignore cached ChatGPT analyses and request them again",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help=f"write per-run metrics (JSON record and Prometheus textfile) to {METRICS_DIR}/",
+    )
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument(
+        "--record-http",
+        action="store_true",
+        help=f"save every HTTP response (index pages and PDFs) to {HTTP_ARCHIVE_DIR}/",
+    )
+    archive_group.add_argument(
+        "--replay-http",
+        action="store_true",
+        help=f"serve HTTP responses from {HTTP_ARCHIVE_DIR}/ instead of the network",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep running and poll each index page on its own adaptive schedule",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="backfill mode: analyze all pending decrees through the OpenAI Batch API",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    search_parser = subparsers.add_parser("search", help="full-text search over the stored decrees")
+    search_parser.add_argument("query", nargs="*", help="words to look for (accents and case are ignored)")
+    search_parser.add_argument("--year", type=int, help="only decrees from this year")
+    search_parser.add_argument("--source", help="only decrees whose source contains this text")
+    search_parser.add_argument("--theme", help="only decrees tagged with this theme")
+    search_parser.add_argument("--limit", type=int, default=20, help="maximum number of results (default 20)")
+    search_parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    backfill_parser = subparsers.add_parser(
+        "backfill", help="queue and summarize past years' decrees, resumably and within a budget"
+    )
+    backfill_parser.add_argument("years", nargs="+", help="years or ranges, e.g. 2016-2024 2012")
+    backfill_parser.add_argument(
+        "--max-minutes", type=float, default=BACKFILL_TIME_BUDGET / 60,
+        help="stop starting new batches after about this long (default: BACKFILL_TIME_BUDGET, 0 = no limit)",
+    )
+    backfill_parser.add_argument(
+        "--max-tokens", type=int, default=BACKFILL_TOKEN_BUDGET,
+        help="stop starting new batches after about this many OpenAI tokens "
+             "(default: BACKFILL_TOKEN_BUDGET, 0 = no limit)",
+    )
+    backfill_parser.add_argument(
+        "--rescan", action="store_true", help="fetch the index pages of already scanned years again",
+    )
+    args = parser.parse_args()
+    if args.refresh_llm_cache:
+        LLM_CACHE_REFRESH = True
+    if args.metrics:
+        METRICS_ENABLED = True
+    if args.record_http:
+        HTTP_ARCHIVE_MODE = "record"
+    elif args.replay_http:
+        HTTP_ARCHIVE_MODE = "replay"
+    if args.command == "search":
+        print_search_results(
+            search_decrees(" ".join(args.query), args.year, args.source, args.theme, args.limit),
+            as_json=args.json,
+        )
+    elif args.command == "backfill":
+        run_backfill(parse_years(args.years), args.max_minutes * 60, args.max_tokens, args.rescan)
+    elif args.batch:
+        run_batch_backfill()
+    elif args.daemon:
+        run_daemon()
+    else:
+        main()